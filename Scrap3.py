@@ -1,7 +1,24 @@
 import requests
 from bs4 import BeautifulSoup
-import re
 import json
+from urllib.parse import urljoin
+
+from crawl_state import CrawlState, content_hash, state_path_for
+from crawler import Crawler
+from dataset_io import write_records
+from html_extract import extract_article
+
+html_backend = None  # None picks the fastest installed parser: selectolax, lxml or html.parser
+
+def parse_article_links(html, page_url):
+    """Extract article links from a listing page"""
+    soup = BeautifulSoup(html, 'html.parser')
+    links = []
+    for a_tag in soup.select('div.m-statement__quote a'):
+        link = a_tag.get('href')
+        if link and link.startswith('/factchecks/'):
+            links.append(urljoin(page_url, link))
+    return links
 
 def get_article_links(base_url, pages=1):
     """Scrape all article links from the listing page"""
@@ -12,79 +29,104 @@ def get_article_links(base_url, pages=1):
             url = f"{base_url}?page={page}"
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Extract article links
-            for a_tag in soup.select('div.m-statement__quote a'):
-                link = a_tag.get('href')
-                if link and link.startswith('/factchecks/'):
-                    full_url = "https://www.politifact.com" + link
-                    articles.append(full_url)
+            articles.extend(parse_article_links(response.text, url))
 
     except Exception as e:
         print(f"Error fetching article links: {str(e)}")
-    
+
     return articles
 
+def parse_article(html):
+    """Extract title, summary and claims from an article page"""
+    return extract_article(html, backend=html_backend)
+
+def report(url, data):
+    """Print success message with URL and title"""
+    print(f"✅ {url} - {data['title'] if data['title'] else 'No Title'} - Summary: {data['summary'] if data['summary'] else 'No Summary'}")
+
 def extract_content(url):
     """Extract data from a single article page"""
     try:
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # 1. Extract the title
-        title_quote = None
-        for quote in soup.select('div.m-statement__quote'):
-            text = clean_text(quote.get_text())
-            if text:
-                title_quote = text
-                break
-
-        # 2. Extract the summary
-        summary = None
-        summary_tag = soup.select_one('h1.c-title')
-        if summary_tag:
-            summary = clean_text(summary_tag.get_text())
-
-        # 3. Extract the claims (excluding all quotes)
-        claims = []
-        main_content = soup.select_one('article.m-textblock')
-        if main_content:
-            for p in main_content.select('p:not(.m-statement__quote)'):
-                text = clean_text(p.get_text())
-                if text and text != title_quote:
-                    claims.append(text)
-
-        # Print success message with URL and title
-        print(f"✅ {url} - {title_quote if title_quote else 'No Title'} - Summary: {summary if summary else 'No Summary'}")
-
-        return {'url': url, 'title': title_quote, 'summary': summary, 'claims': claims}
+        data = parse_article(response.text)
+        report(url, data)
+        return {'url': url, **data}
 
     except Exception as e:
         print(f"❌ Error extracting content from {url}: {str(e)}")
         return {'url': url, 'title': None, 'summary': None, 'claims': []}
 
-def clean_text(text):
-    """Enhance text cleaning"""
-    text = re.sub(r'\s+', ' ', text)  # Merge whitespace characters
-    text = re.sub(r'[\xa0\u200b]', '', text)  # Remove special characters
-    return text.strip()
+def crawl(base_url, pages=1, concurrency=8, per_host_rate=4.0):
+    """Fetch listing pages and their articles concurrently; results keep the serial crawl order"""
+    crawler = Crawler(concurrency=concurrency, per_host_rate=per_host_rate)
+    listing_urls = [f"{base_url}?page={page}" for page in range(1, pages + 1)]
+    results = []
+    try:
+        for result in crawler.crawl(listing_urls, parse_article_links, parse_article):
+            if result.error is None:
+                report(result.url, result.data)
+                results.append((result.index, {'url': result.url, **result.data}))
+            else:
+                print(f"❌ Error extracting content from {result.url}: {str(result.error)}")
+                results.append((result.index, {'url': result.url, 'title': None, 'summary': None, 'claims': []}))
+    finally:
+        crawler.close()
+    return [data for _, data in sorted(results, key=lambda item: item[0])]
+
+def crawl_incremental(base_url, pages=1, filename='results.jsonl', state_path=None,
+                      recheck_after=24 * 3600, concurrency=8, per_host_rate=4.0):
+    """Crawl only new or changed articles and append them to a JSON lines file"""
+    crawler = Crawler(concurrency=concurrency, per_host_rate=per_host_rate)
+    # One state per output file, or another scraper's history would skip articles this file never got
+    state = CrawlState(state_path or state_path_for(filename))
+    listing_urls = [f"{base_url}?page={page}" for page in range(1, pages + 1)]
+    counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'failed': 0}
+    try:
+        with open(filename, 'a', encoding='utf-8') as f:
+            results = crawler.crawl(listing_urls, parse_article_links, parse_article,
+                                    state=state, recheck_after=recheck_after)
+            for result in results:
+                if result.error is not None:
+                    # Not recorded in the state, so the next run retries it
+                    print(f"❌ Error extracting content from {result.url}: {str(result.error)}")
+                    counts['failed'] += 1
+                    continue
+                if result.not_modified:
+                    state.touch(result.url)
+                    counts['unchanged'] += 1
+                    continue
+
+                data = {'url': result.url, **result.data}
+                new_hash = content_hash(data)
+                if not state.is_changed(result.url, new_hash):
+                    state.record(result.url, result.etag, result.last_modified, new_hash)
+                    counts['unchanged'] += 1
+                    continue
+
+                counts['new' if state.get(result.url) is None else 'changed'] += 1
+                report(result.url, result.data)
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+                f.flush()
+                # Record the page only once its data is safely in the output file
+                state.record(result.url, result.etag, result.last_modified, new_hash)
+    finally:
+        crawler.close()
+        state.close()
+    return counts
 
 def save_results(data_list, filename='results.json'):
     """Save results as JSON"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data_list, f, ensure_ascii=False, indent=4)
+    write_records(filename, data_list)
 
 if __name__ == "__main__":
     base_url = 'https://www.politifact.com/factchecks/list/'
-    article_links = get_article_links(base_url)  # Scrape the first 2 pages of article links
-
-    extracted_data = [extract_content(url) for url in article_links]
+    # Only articles that are new or changed since the last run are fetched and appended
+    counts = crawl_incremental(base_url)
 
-    if extracted_data:
-        save_results(extracted_data)
-        print("\n🎉 Data extraction completed and saved as results.json")
+    if counts['new'] or counts['changed']:
+        print(f"\n🎉 Data extraction completed and appended to results.jsonl: {counts}")
     else:
-        print("❌ No valid content found")
+        print(f"❌ No new content found: {counts}")
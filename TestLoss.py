@@ -1,59 +1,96 @@
 import csv
 import torch
-from torch.utils.data import DataLoader
-from datasets import load_dataset
-from transformers import AutoModelForCausalLM, AutoTokenizer, default_data_collator
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from token_cache import DEFAULT_CACHE_DIR, load_token_store
 
 # 定义路径
 fine_tuned_model_path = "./llama-3.2-3b-instruct-finetuned"  # 训练好的模型路径
 test_dataset_path = "./test_dataset.json"  # 测试集路径
 test_loss_csv_path = "test_loss.csv"  # 输出 CSV 文件
+token_cache_dir = DEFAULT_CACHE_DIR  # 预分词缓存目录，同一 tokenizer 和 max_length 只分词一次
+
+max_length = 512
+# "dynamic": 按长度排序、按 token 预算组 batch，只 pad 到 batch 内最长样本，pad 不计入 loss，按 token 加权平均
+# "max_length": 原来的方式，全部 pad 到 max_length，固定 batch_size，对每个 batch 的 loss 取平均
+padding_mode = "dynamic"
+max_batch_tokens = 8192  # dynamic 模式下每个 batch 的 token 上限（batch 大小 × 最长样本长度）
+batch_size = 4  # max_length 模式下的 batch 大小
+
+
+def load_model_and_tokenizer(model_path):
+    model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float16, device_map="auto")
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+    return model, tokenizer
+
+
+def pad_token_id(tokenizer):
+    return tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+
+def compute_test_loss(model, store, pad_id, batch_size=4, max_length=512):
+    """测试集平均 loss；所有样本 pad 到 max_length，labels 包含 pad，对每个 batch 的 loss 取平均"""
+    model.eval()
+    total_loss = 0
+    num_batches = 0
+
+    with torch.no_grad():
+        for batch in store.iter_batches(batch_size, pad_id, pad_to=max_length):
+            batch = {k: v.to(model.device) for k, v in batch.items()}  # 确保 batch 在正确的设备上
+            outputs = model(**batch)
+
+            # 确保 outputs.loss 存在
+            if outputs.loss is not None:
+                total_loss += outputs.loss.item()
+                num_batches += 1
+
+    return total_loss / num_batches if num_batches > 0 else float("nan")
 
-# 加载模型和 tokenizer
-model = AutoModelForCausalLM.from_pretrained(fine_tuned_model_path, torch_dtype=torch.float16, device_map="auto")
-tokenizer = AutoTokenizer.from_pretrained(fine_tuned_model_path, trust_remote_code=True)
 
-# 加载测试数据集
-test_dataset = load_dataset("json", data_files=test_dataset_path, split="train")
+def compute_test_loss_dynamic(model, store, pad_id, max_batch_tokens=8192):
+    """测试集平均 loss；batch 只 pad 到最长样本，pad 位置不参与 loss，结果按预测 token 数加权"""
+    model.eval()
+    total_loss = 0.0
+    total_tokens = 0
 
-# 预处理：Tokenization，**添加 labels**
-def tokenize_function(example):
-    tokenized = tokenizer(example["text"], truncation=True, padding="max_length", max_length=512, return_tensors="pt")
-    tokenized["labels"] = tokenized["input_ids"].clone()  # 这里添加 labels，保证 loss 计算
-    return tokenized
+    with torch.no_grad():
+        for batch in store.iter_dynamic_batches(max_batch_tokens, pad_id):
+            # 与模型计算 loss 时的移位一致：只统计 labels[:, 1:] 中不是 -100 的 token（样本总在右侧 pad，每个样本 n - 1 个）
+            num_tokens = int((batch["labels"][:, 1:] != -100).sum())
+            if num_tokens == 0:
+                continue
+            batch = {k: v.to(model.device) for k, v in batch.items()}
+            outputs = model(**batch)
 
-test_dataset = test_dataset.map(tokenize_function, batched=True, remove_columns=["text"])
+            # outputs.loss 是这个 batch 内所有预测 token 的平均值，还原成总和再累加
+            if outputs.loss is not None:
+                total_loss += outputs.loss.item() * num_tokens
+                total_tokens += num_tokens
 
-# 创建 DataLoader，确保 batch 是 tensor
-def collate_fn(batch):
-    return {key: torch.stack([torch.tensor(d[key]) for d in batch]) for key in batch[0]}
+    return total_loss / total_tokens if total_tokens > 0 else float("nan")
 
-test_dataloader = DataLoader(test_dataset, batch_size=4, collate_fn=collate_fn)
 
-# 计算测试集 loss
-model.eval()
-total_loss = 0
-num_batches = 0
+def save_test_loss(path, avg_test_loss):
+    with open(path, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["epoch", "test_loss"])
+        writer.writerow([1, avg_test_loss])  # 这里只计算一个 epoch，如果有多个 epoch 可以循环记录
 
-with torch.no_grad():
-    for batch in test_dataloader:
-        batch = {k: v.to(model.device) for k, v in batch.items()}  # 确保 batch 在正确的设备上
-        outputs = model(**batch)
 
-        # 确保 outputs.loss 存在
-        if outputs.loss is not None:
-            loss = outputs.loss.item()
-            total_loss += loss
-            num_batches += 1
+if __name__ == "__main__":
+    # 加载模型和 tokenizer
+    model, tokenizer = load_model_and_tokenizer(fine_tuned_model_path)
 
-# 计算平均测试集 loss
-avg_test_loss = total_loss / num_batches if num_batches > 0 else float("nan")
-print(f"Average Test Loss: {avg_test_loss}")
+    # 加载预分词的测试集（首次运行时分词并写入缓存）
+    store = load_token_store(test_dataset_path, tokenizer, max_length, token_cache_dir)
 
-# 记录到 CSV
-with open(test_loss_csv_path, mode="w", newline="") as file:
-    writer = csv.writer(file)
-    writer.writerow(["epoch", "test_loss"])
-    writer.writerow([1, avg_test_loss])  # 这里只计算一个 epoch，如果有多个 epoch 可以循环记录
+    # 计算平均测试集 loss
+    if padding_mode == "dynamic":
+        avg_test_loss = compute_test_loss_dynamic(model, store, pad_token_id(tokenizer), max_batch_tokens)
+    else:
+        avg_test_loss = compute_test_loss(model, store, pad_token_id(tokenizer), batch_size, max_length)
+    print(f"Average Test Loss: {avg_test_loss}")
 
-print(f"Test loss saved to {test_loss_csv_path}")
+    # 记录到 CSV
+    save_test_loss(test_loss_csv_path, avg_test_loss)
+    print(f"Test loss saved to {test_loss_csv_path}")
@@ -1,46 +1,130 @@
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
 import gradio as gr
 
-# Load the fine-tuned model and tokenizer
+import explain_service
+from explain_service import QueueFull, RequestQueue
+from metrics import registry
+from micro_batching import MicroBatcher
+from model_loading import ModelLoader, ModelNotReady
+from prefix_cache import prefix_cache_for
+from response_cache import EmbeddingIndex, ResponseCache
+from speculative import load_draft_model
+
+# The fine-tuned model and tokenizer
 fine_tuned_model = "./DeepSeek-8B-finetuned"
-tokenizer = AutoTokenizer.from_pretrained(fine_tuned_model, trust_remote_code=True)
-model = AutoModelForCausalLM.from_pretrained(
-    fine_tuned_model,
-    torch_dtype=torch.float16,  # Choose dtype based on your hardware
-    device_map="auto"  # Automatically map to GPU or CPU
+
+# Startup settings: the interface comes up at once and the model loads in the background
+# fp16 safetensors snapshot (e.g. "./DeepSeek-8B-finetuned-fp16"): written after the first start, then loaded memory-mapped
+snapshot_dir = None
+warmup_claim = "The Earth orbits the Sun."  # Generated once before the model is reported ready; None to skip
+warmup_max_length = 96
+health_port = 8081  # GET /health answers 200 once the model is ready, 503 before; None to disable
+metrics_dump_path = None  # e.g. "generation_metrics.jsonl": a metrics snapshot is appended every interval
+metrics_dump_interval = 60
+
+# Serving settings
+# "stream": tokens go to the Textbox as they are produced
+# "batch": claims arriving within max_batch_wait_ms are generated together, up to max_batch_size
+# "single": one generate call per claim
+serving_mode = "stream"
+max_batch_size = 8
+max_batch_wait_ms = 20
+request_queue = RequestQueue(  # Concurrent generations / requests allowed to wait
+    concurrency=max_batch_size if serving_mode == "batch" else 1,
+    max_waiting=16
 )
+batcher = MicroBatcher(
+    lambda claims: explain_service.generate_explanations(*loader.get(), claims, max_length=300),
+    max_batch_size=max_batch_size,
+    max_wait_ms=max_batch_wait_ms
+)
+
+# Response cache for repeated claims; near-duplicates are served too when sentence-transformers is installed
+use_semantic_cache = False
+response_cache = ResponseCache(
+    max_entries=1024,
+    ttl_seconds=24 * 3600,
+    semantic_index=EmbeddingIndex(threshold=0.95) if use_semantic_cache else None
+)
+decoding_params = {"max_length": 300, "temperature": 0.7, "top_p": 0.9}
+
+# Key/values of the fixed instruction at the start of every prompt, computed once and reused per request
+use_prefix_cache = True
+
+def get_prefix_cache(model, tokenizer):
+    return prefix_cache_for(model, tokenizer, explain_service.PROMPT_PREFIX) if use_prefix_cache else None
+
+# Speculative decoding: a smaller model drafts tokens that the fine-tuned model verifies (single and stream modes)
+draft_model_path = None  # e.g. "./llama-3.2-3b-instruct-finetuned" (its tokenizer differs, drafts are re-tokenized)
+draft = None
 
 # Define the function to generate explanations
 def generate_explanation(claim, max_length=300, temperature=0.7):
-    # Construct the input prompt
-    instruction = (
-        "Provide a detailed explanation to help verify the following claim:\n\n"
-        f"Claim: {claim}\n\n"
-        "Explanation:"
-    )
-    
-    # Convert the input prompt to model input
-    inputs = tokenizer(instruction, return_tensors="pt").to(model.device)
-    
-    # Generate output using the model
-    outputs = model.generate(
-        **inputs,
-        max_length=max_length,
-        temperature=temperature,
-        top_p=0.9,
-        do_sample=True,
-        eos_token_id=tokenizer.eos_token_id,
+    model, tokenizer = loader.get()
+    return explain_service.generate_explanation(
+        model, tokenizer, claim, max_length, temperature, get_prefix_cache(model, tokenizer), draft
     )
-    
-    # Decode the generated text
-    explanation = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    return explanation
+
+# Runs in the loader thread: loads the draft model, and the first request doesn't pay for one-time setup
+# (prefix cache, kernels, allocator)
+def warm_up(model, tokenizer):
+    global draft
+    if draft_model_path:
+        draft = load_draft_model(draft_model_path, torch_dtype=torch.float16, device_map="auto")
+        registry.add_gauges("draft", draft.stats)
+    if warmup_claim:
+        explain_service.generate_explanation(
+            model, tokenizer, warmup_claim, warmup_max_length, prefix_cache=get_prefix_cache(model, tokenizer),
+            draft=draft
+        )
+
+loader = ModelLoader(
+    fine_tuned_model,
+    snapshot_dir=snapshot_dir,
+    warmup=warm_up if warmup_claim or draft_model_path else None,
+    torch_dtype=torch.float16,  # Choose dtype based on your hardware
+    device_map="auto"  # Automatically map to GPU or CPU
+).start()
+if health_port:
+    loader.serve_health(health_port)  # Also serves GET /metrics (token counts, time to first token, latencies)
+# Queue depth and cache hits go out as gauges on /metrics and in the dumps
+registry.add_gauges("request_queue", request_queue.depth)
+registry.add_gauges("response_cache", response_cache.stats)
+if metrics_dump_path:
+    registry.start_dump(metrics_dump_path, metrics_dump_interval)
 
 # Define the function for interactive interface
 def interactive_interface(claim):
-    explanation = generate_explanation(claim)
-    return explanation
+    # The cache holds only the text after the prompt, so a hit repeats this request's own claim
+    prompt = explain_service.build_prompt(claim)
+    continuation = response_cache.get(claim, fine_tuned_model, decoding_params)
+    if continuation is not None:
+        yield prompt + continuation
+        return
+
+    explanation = ""
+    try:
+        model, tokenizer = loader.get()
+        with request_queue.slot():
+            if serving_mode == "stream":
+                for explanation in explain_service.stream_explanation(
+                    model, tokenizer, claim, max_length=300, prefix_cache=get_prefix_cache(model, tokenizer),
+                    draft=draft
+                ):
+                    yield explanation
+            elif serving_mode == "batch":
+                explanation = batcher(claim)
+                yield explanation
+            else:
+                explanation = generate_explanation(claim)
+                yield explanation
+    except ModelNotReady as e:
+        raise gr.Error(str(e))
+    except QueueFull:
+        raise gr.Error("The server is busy, please try again in a moment.")
+
+    if explanation.startswith(prompt):
+        response_cache.put(claim, fine_tuned_model, decoding_params, explanation[len(prompt):])
 
 custom_css = """
 h1 { font-size: 32px !important; }  /* Title font size */
@@ -57,5 +141,8 @@ interface = gr.Interface(
     css=custom_css
 )
 
+# Let Gradio hand every request to request_queue, which does the limiting and reports the depth
+interface.queue(default_concurrency_limit=None)
+
 # Launch the Gradio interface with a public sharing URL
 interface.launch(share=True)
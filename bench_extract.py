@@ -0,0 +1,61 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+from fixture_server import FIXTURE_DIR
+from html_extract import available_backends, extract_article
+
+REFERENCE_BACKEND = "html.parser"
+
+
+def load_pages(directory=FIXTURE_DIR):
+    """Saved article pages (listing pages are skipped)"""
+    paths = sorted(glob.glob(os.path.join(directory, "factchecks", "**", "index.html"), recursive=True))
+    pages = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append((path, f.read()))
+    return pages
+
+
+def check_backends(pages, backends):
+    """Return (backend, page path) pairs whose output differs from the reference parser"""
+    mismatches = []
+    for path, html in pages:
+        expected = extract_article(html, backend=REFERENCE_BACKEND)
+        for backend in backends:
+            if extract_article(html, backend=backend) != expected:
+                mismatches.append((backend, path))
+    return mismatches
+
+
+def pages_per_second(pages, backend, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _, html in pages:
+            extract_article(html, backend=backend)
+    return rounds * len(pages) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the extract_article parser backends.")
+    parser.add_argument("--pages", default=FIXTURE_DIR, help="Directory of saved pages")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    backends = available_backends()
+    print(f"{len(pages)} pages, backends: {', '.join(backends)}")
+    if REFERENCE_BACKEND not in backends:
+        sys.exit("beautifulsoup4 is needed as the reference backend.")
+
+    mismatches = check_backends(pages, backends)
+    for backend, path in mismatches:
+        print(f"❌ {backend} differs from {REFERENCE_BACKEND} on {path}")
+
+    for backend in backends:
+        print(f"{backend:>12}: {pages_per_second(pages, backend, args.rounds):9.1f} pages/s")
+
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from dataset_io import read_records, write_records
+from load_test import claims_from_dataset, percentile, run_load
+
+DEFAULT_MODEL = "hf-internal-testing/tiny-random-LlamaForCausalLM"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+
+def summarize(latencies, samples, seconds):
+    """samples/s over the whole run, plus the latency percentiles of its timed units"""
+    return {
+        "samples": samples,
+        "seconds": round(seconds, 4),
+        "samples_per_second": round(samples / seconds, 3) if seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def time_rounds(run, rounds):
+    """Call run() `rounds` times; returns the latency of each call and the total time"""
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        call_start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - call_start)
+    return latencies, time.perf_counter() - start
+
+
+def _load(settings):
+    import torch
+    from model_loading import load_model
+
+    torch.manual_seed(settings["seed"])
+    return load_model(settings["model"], device_map="cpu", mode="default")
+
+
+def bench_generate(settings, samples, work_dir):
+    """generate_responses; each sample's latency is that of the generate call it was part of"""
+    from generation import generate_responses
+
+    model, tokenizer = _load(settings)
+    batch_size = settings["batch_size"]
+    generate_responses(model, tokenizer, samples[:batch_size], max_new_tokens=settings["max_new_tokens"],
+                       batch_size=batch_size)  # Warm-up
+    latencies = []
+    start = time.perf_counter()
+    for first in range(0, len(samples), batch_size):
+        batch = samples[first:first + batch_size]
+        call_start = time.perf_counter()
+        generate_responses(model, tokenizer, batch, max_new_tokens=settings["max_new_tokens"], batch_size=batch_size)
+        latencies += [time.perf_counter() - call_start] * len(batch)
+    return summarize(latencies, len(samples), time.perf_counter() - start)
+
+
+def bench_rouge(settings, samples, work_dir):
+    """compute_rouge_scores of every reference against the next one; latency per full pass"""
+    from rouge_engine import compute_rouge_scores
+
+    references = [sample["text"] for sample in samples]
+    hypotheses = references[1:] + references[:1]
+    latencies, seconds = time_rounds(lambda: compute_rouge_scores(references, hypotheses), settings["rounds"])
+    return summarize(latencies, len(samples) * settings["rounds"], seconds)
+
+
+def bench_loss(settings, samples, work_dir):
+    """TestLoss's token-budget loss loop over a pre-tokenized store; latency per full pass"""
+    from TestLoss import compute_test_loss_dynamic, pad_token_id
+    from token_cache import load_token_store
+
+    model, tokenizer = _load(settings)
+    dataset_path = os.path.join(work_dir, "loss_dataset.jsonl")
+    write_records(dataset_path, samples)
+    store = load_token_store(dataset_path, tokenizer, max_length=512, cache_dir=os.path.join(work_dir, "token_cache"))
+    pad_id = pad_token_id(tokenizer)
+    latencies, seconds = time_rounds(lambda: compute_test_loss_dynamic(model, store, pad_id, 8192), settings["rounds"])
+    return summarize(latencies, len(samples) * settings["rounds"], seconds)
+
+
+def bench_explain(settings, samples, work_dir):
+    """generate_explanation behind one lock (the UI's single mode) under Poisson arrivals; latency per request"""
+    import threading
+
+    import explain_service
+
+    model, tokenizer = _load(settings)
+    claims = claims_from_dataset(settings["dataset"], len(samples))
+    lock = threading.Lock()
+
+    def handler(claim):
+        with lock:
+            return explain_service.generate_explanation(model, tokenizer, claim, max_length=settings["max_length"])
+
+    handler(claims[0])  # Warm-up
+    latencies, seconds = run_load(handler, claims, settings["rate"], settings["concurrency"], settings["seed"])
+    return summarize(latencies, len(claims), seconds)
+
+
+def bench_extract(settings, samples, work_dir):
+    """scrap1.extract_content against the saved politifact pages on a local server; latency per page"""
+    from bench_extract import load_pages
+    from fixture_server import FIXTURE_DIR, serve_fixtures
+    from scrap1 import extract_content
+
+    paths = [path for path, _ in load_pages()]
+    with serve_fixtures() as base_url:
+        urls = [base_url + "/" + os.path.relpath(os.path.dirname(path), FIXTURE_DIR) + "/" for path in paths]
+        latencies, seconds = time_rounds(lambda: [extract_content(url) for url in urls], settings["rounds"])
+    # One round fetches every page; spread its time over them
+    latencies = [latency / len(urls) for latency in latencies for _ in urls]
+    return summarize(latencies, len(urls) * settings["rounds"], seconds)
+
+
+def bench_clean(settings, samples, work_dir):
+    """delate.py's cleaning pass (clean_file with its rules) over synthetic scraped records; latency per file"""
+    import delate
+    from cleaning import clean_file
+
+    rng = random.Random(settings["seed"])
+    texts = [sample["text"] for sample in samples]
+    records = []
+    for i in range(settings["clean_records"]):
+        claims = [rng.choice(texts)[:300] + "\xa0 (Screenshot from X)" for _ in range(3)]
+        records.append({"title": f"Claim {i}", "summary": rng.choice(texts)[:200], "claims": claims})
+    input_path = os.path.join(work_dir, "clean_input.jsonl")
+    output_path = os.path.join(work_dir, "clean_output.jsonl")
+    write_records(input_path, records)
+
+    def run():
+        clean_file(input_path, output_path, delate.RULES, delate.FIELDS, settings["workers"], delate.CHUNK_SIZE)
+
+    latencies, seconds = time_rounds(run, settings["rounds"])
+    return summarize(latencies, len(records) * settings["rounds"], seconds)
+
+
+# Each one is called with (settings, dataset slice, scratch directory) and returns summarize()'s dict
+BENCHMARKS = {
+    "generate": bench_generate,
+    "rouge": bench_rouge,
+    "loss": bench_loss,
+    "explain": bench_explain,
+    "extract": bench_extract,
+    "clean": bench_clean,
+}
+
+
+def _run_one(name, settings):
+    """Run one benchmark in this (fresh) process; peak RSS is this process's own"""
+    random.seed(settings["seed"])
+    samples = []
+    for sample in read_records(settings["dataset"]):
+        samples.append(sample)
+        if len(samples) == settings["samples"]:
+            break
+
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        result = BENCHMARKS[name](settings, samples, work_dir)
+    except ImportError as e:
+        return {"skipped": f"missing dependency: {e.name or e}"}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ru_maxrss is in KB
+    return result
+
+
+def run_benchmarks(names, settings):
+    """Each benchmark runs in its own spawned process, so imports, caches and peak RSS don't carry over"""
+    results = {}
+    for name in names:
+        print(f"Running {name}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results[name] = executor.submit(_run_one, name, settings).result()
+    return results
+
+
+def environment():
+    import torch
+    import transformers
+
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "cpus": os.cpu_count(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each benchmark next to the baseline; returns the names whose samples/s dropped by more than tolerance"""
+    regressions = []
+    print(f"{'benchmark':>10} {'samples/s':>10} {'baseline':>10} {'change':>8} {'p50 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:>10} skipped ({result['skipped']})")
+            continue
+        before = baseline.get(name, {}).get("samples_per_second")
+        change = ""
+        if before:
+            ratio = result["samples_per_second"] / before - 1
+            change = f"{ratio:+.1%}"
+            if ratio < -tolerance:
+                regressions.append(name)
+                change += " ❌"
+        print(f"{name:>10} {result['samples_per_second']:10.2f} {before or float('nan'):10.2f} {change:>8} "
+              f"{result['p50_ms']:9.1f} {result['p99_ms']:9.1f} {result['peak_rss_mb']:8.1f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the eval, serving and crawl hot paths on tiny, fixed inputs.")
+    parser.add_argument("benchmarks", nargs="*", help=f"Any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Tiny causal LM used by the model benchmarks")
+    parser.add_argument("--dataset", default="./test_dataset.json")
+    parser.add_argument("--samples", type=int, default=32, help="First N samples of the dataset")
+    parser.add_argument("--rounds", type=int, default=5, help="Repetitions of the ROUGE, loss, extract and clean passes")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=160, help="max_length of generate_explanation")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=20.0, help="Arrivals per second in the explain benchmark")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--clean-records", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=2, help="Cleaning processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Results to compare against, if the file exists")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed samples/s drop before failing")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    settings = {key: value for key, value in vars(args).items()
+                if key not in ("benchmarks", "output", "baseline", "save_baseline", "tolerance")}
+    results = run_benchmarks(args.benchmarks or list(BENCHMARKS), settings)
+    report = {"settings": settings, "environment": environment(), "results": results}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["settings"] != settings or saved["environment"] != report["environment"]:
+            print(f"⚠️ {args.baseline} was recorded with other settings or on another environment")
+        baseline = saved["results"]
+    regressions = compare(results, baseline, args.tolerance)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results saved to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+
+    sys.exit(1 if regressions else 0)
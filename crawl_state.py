@@ -0,0 +1,71 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+DEFAULT_STATE_PATH = "./crawl_state.sqlite"
+
+
+def state_path_for(output_file):
+    """Crawl state kept next to an output file: each output records which pages it already holds"""
+    return output_file + ".state.sqlite"
+
+
+def content_hash(data):
+    """Hash of the extracted record, so page chrome that changes on every request doesn't count as a change"""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    """Per-URL crawl history: last fetch time, ETag / Last-Modified and a hash of the extracted content"""
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, last_fetch REAL, etag TEXT, last_modified TEXT, content_hash TEXT)"
+        )
+        self.connection.commit()
+
+    def get(self, url):
+        row = self.connection.execute(
+            "SELECT last_fetch, etag, last_modified, content_hash FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("last_fetch", "etag", "last_modified", "content_hash"), row))
+
+    def is_fresh(self, url, max_age):
+        """True if the URL was fetched less than max_age seconds ago"""
+        page = self.get(url)
+        return bool(max_age) and page is not None and time.time() - page["last_fetch"] < max_age
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a re-fetch of a known URL"""
+        page = self.get(url)
+        headers = {}
+        if page is not None and page["etag"]:
+            headers["If-None-Match"] = page["etag"]
+        if page is not None and page["last_modified"]:
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def is_changed(self, url, new_hash):
+        page = self.get(url)
+        return page is None or page["content_hash"] != new_hash
+
+    def record(self, url, etag, last_modified, new_hash):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO pages (url, last_fetch, etag, last_modified, content_hash) VALUES (?, ?, ?, ?, ?)",
+            (url, time.time(), etag, last_modified, new_hash)
+        )
+        self.connection.commit()
+
+    def touch(self, url):
+        """Mark a URL as re-checked without changes (e.g. after a 304 Not Modified)"""
+        self.connection.execute("UPDATE pages SET last_fetch = ? WHERE url = ?", (time.time(), url))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
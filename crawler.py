@@ -0,0 +1,138 @@
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# index: (listing page, position on it); etag / last_modified: the response's validators;
+# not_modified: the server answered a conditional request with 304, so data is None
+CrawlResult = namedtuple(
+    "CrawlResult",
+    ["url", "data", "error", "index", "etag", "last_modified", "not_modified"],
+    defaults=(None, None, False)
+)
+
+
+class HostRateLimiter:
+    """Space out requests to the same host so each host sees at most `rate` requests per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Crawler:
+    """Fetch pages over one pooled session with bounded concurrency, per-host rate limits and retries"""
+
+    def __init__(self, concurrency=8, per_host_rate=4.0, retries=3, backoff=0.5, timeout=10, headers=None):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(per_host_rate)
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        # Keep one reusable connection per worker instead of a new connection per request
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())  # Exponential backoff with jitter
+
+    def fetch(self, url, headers=None):
+        """GET a URL, retrying connection errors and 429/5xx responses with backoff"""
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(url)
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                time.sleep(self._retry_delay(attempt, response))
+                continue
+            response.raise_for_status()
+            return response
+
+    def _fetch_links(self, url, parse_links):
+        return parse_links(self.fetch(url).text, url)
+
+    def _fetch_article(self, url, parse_article, headers=None):
+        response = self.fetch(url, headers=headers)
+        if response.status_code == 304:
+            return None, None, None, True
+        return parse_article(response.text), response.headers.get("ETag"), response.headers.get("Last-Modified"), False
+
+    def crawl(self, listing_urls, parse_links, parse_article, state=None, recheck_after=None):
+        """Fetch listing pages and the articles they link to as one pipeline.
+
+        parse_links(html, page_url) returns absolute article URLs and
+        parse_article(html) returns the article's data. Article fetches start
+        as soon as their listing page is parsed; CrawlResults are yielded as
+        they complete; sorting them by `index` gives the order of a serial crawl.
+
+        With a CrawlState, known articles are re-fetched with conditional
+        headers, and those fetched less than `recheck_after` seconds ago are
+        not requested at all. The state is only read here (always on the
+        calling thread); recording results is up to the caller.
+        """
+        seen = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = {}
+            for page_index, url in enumerate(listing_urls):
+                pending[executor.submit(self._fetch_links, url, parse_links)] = ("listing", url, page_index)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, url, index = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if kind == "article":
+                            yield CrawlResult(url, None, e, index)
+                        else:
+                            print(f"Error fetching article links from {url}: {str(e)}")
+                        continue
+
+                    if kind == "article":
+                        data, etag, last_modified, not_modified = result
+                        yield CrawlResult(url, data, None, index, etag, last_modified, not_modified)
+                        continue
+                    for position, link in enumerate(result):
+                        if link in seen:
+                            continue
+                        seen.add(link)
+                        if state is not None and state.is_fresh(link, recheck_after):
+                            continue
+                        headers = state.conditional_headers(link) if state is not None else None
+                        article_future = executor.submit(self._fetch_article, link, parse_article, headers)
+                        pending[article_future] = ("article", link, (index, position))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import struct
+from array import array
+
+INDEX_SUFFIX = ".idx"
+_INDEX_HEADER = struct.Struct("<QQ")  # data file size and mtime (ns) the index was built for
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """Yield the items of a top-level JSON array one at a time, reading the file in chunks"""
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        position = 0
+        started = False
+        eof = False
+        while True:
+            # Skip whitespace and the separators between items
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer) and not eof:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            if position == len(buffer):
+                raise ValueError(f"{path}: unexpected end of file inside the JSON array")
+
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError(f"{path}: not a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item continues past the buffer; read more and try again
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            if not eof and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+                # A bare number cut by the chunk boundary (e.g. "7." of "7.5") needs more input
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item
+            position = end
+
+
+def read_jsonl(path):
+    """Yield one record per non-empty line"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_records(path):
+    """Stream records from a JSON lines file or a JSON array file, whichever `path` is"""
+    if path.endswith(".jsonl"):
+        return read_jsonl(path)
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+    return iter_json_array(path) if first == "[" else read_jsonl(path)
+
+
+class RecordWriter:
+    """Write records one at a time: JSON lines for .jsonl paths, an indented JSON array otherwise.
+
+    The array layout is exactly json.dump(records, indent=4). Output goes to a
+    temporary file that replaces `path` on close(), so readers never see a
+    half-written file.
+    """
+
+    def __init__(self, path, jsonl=None, indent=4):
+        self.path = path
+        self.jsonl = path.endswith(".jsonl") if jsonl is None else jsonl
+        self.indent = indent
+        self.count = 0
+        self.file = open(f"{path}.tmp", "w", encoding="utf-8")
+
+    def write(self, record):
+        if self.jsonl:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            pad = " " * self.indent
+            self.file.write("[\n" if self.count == 0 else ",\n")
+            text = json.dumps(record, ensure_ascii=False, indent=self.indent)
+            self.file.write("\n".join(pad + line for line in text.split("\n")))
+        self.count += 1
+
+    def close(self):
+        if not self.jsonl:
+            self.file.write("\n]" if self.count else "[]")
+        self.file.close()
+        os.replace(f"{self.path}.tmp", self.path)
+        return self.count
+
+    def abort(self):
+        self.file.close()
+        os.remove(f"{self.path}.tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _write_all(path, records, jsonl=None, indent=4):
+    with RecordWriter(path, jsonl, indent) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def write_jsonl(path, records):
+    """Write records as JSON lines; returns the number written"""
+    return _write_all(path, records, jsonl=True)
+
+
+def append_jsonl(path, records):
+    with open(path, "a", encoding="utf-8") as f:
+        count = 0
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def write_json_array(path, records, indent=4):
+    """Stream records into a JSON array laid out exactly like json.dump(records, indent=4)"""
+    return _write_all(path, records, jsonl=False, indent=indent)
+
+
+def write_records(path, records):
+    """Write JSON lines for .jsonl paths and an indented JSON array otherwise"""
+    return _write_all(path, records)
+
+
+def count_records(path):
+    return sum(1 for _ in read_records(path))
+
+
+def _data_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build_index(path):
+    """Record the byte offset of every record line in `path` + '.idx'"""
+    offsets = array("Q")
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                offsets.append(offset)
+            offset += len(line)
+    with open(path + INDEX_SUFFIX, "wb") as f:
+        f.write(_INDEX_HEADER.pack(*_data_signature(path)))
+        offsets.tofile(f)
+    return offsets
+
+
+def load_index(path):
+    """Offsets for `path`, rebuilding the index if it is missing or older than the data"""
+    index_path = path + INDEX_SUFFIX
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as f:
+            header = f.read(_INDEX_HEADER.size)
+            if len(header) == _INDEX_HEADER.size and _INDEX_HEADER.unpack(header) == _data_signature(path):
+                offsets = array("Q")
+                offsets.frombytes(f.read())
+                return offsets
+    return build_index(path)
+
+
+class JsonlIndex:
+    """Random access to the records of a JSON lines file through its offset index"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = load_index(path)
+        self.file = open(path, "rb")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        self.file.seek(self.offsets[i])
+        return json.loads(self.file.readline())
+
+    def __iter__(self):
+        return read_jsonl(self.path)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert, count and index dataset files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="Convert a JSON array file to JSON lines (or back)")
+    convert.add_argument("source")
+    convert.add_argument("target")
+    convert.add_argument("--index", action="store_true", help="Also build the offset index for the target")
+    count = commands.add_parser("count", help="Count the records in a file")
+    count.add_argument("path")
+    index = commands.add_parser("index", help="Build the offset index of a JSON lines file")
+    index.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        written = write_records(args.target, read_records(args.source))
+        if args.index and args.target.endswith(".jsonl"):
+            build_index(args.target)
+        print(f"{written} records written to {args.target}")
+    elif args.command == "count":
+        print(count_records(args.path))
+    else:
+        print(f"{len(build_index(args.path))} records indexed in {args.path}{INDEX_SUFFIX}")
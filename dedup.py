@@ -0,0 +1,247 @@
+import argparse
+import hashlib
+import os
+import re
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from dataset_io import read_records, write_records
+from split import record_key, split_dataset
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_LOW_29 = np.uint64((1 << 29) - 1)
+_SHINGLE_BASE = np.uint64(0x100000001B3)  # FNV-1a 64-bit prime, mixes token hashes into shingle hashes
+_word = re.compile(r"\w+")
+
+
+def _text_of(record, field):
+    value = record.get(field)
+    if isinstance(value, list):
+        return " ".join(item for item in value if isinstance(item, str))
+    return value if isinstance(value, str) else ""
+
+
+def key_hash(record, key="claim", field="text"):
+    """Stable 64-bit hash of the record's split key (see split.record_key), falling back to its `field` text"""
+    try:
+        value = record_key(record, key)
+    except (KeyError, ValueError):
+        value = _text_of(record, field)
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingle_hashes(text, shingle_size=5):
+    """Distinct 32-bit hashes of the word n-grams of the case-folded text"""
+    tokens = _word.findall(text.casefold())
+    if not tokens:
+        return np.zeros(1, dtype=np.uint64)  # Every empty text is a duplicate of every other one
+    token_hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint64,
+                               count=len(tokens))
+    size = min(shingle_size, len(tokens))
+    count = len(tokens) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    with np.errstate(over="ignore"):  # Wrapping uint64 arithmetic is intended
+        for offset in range(size):
+            hashes = hashes * _SHINGLE_BASE + token_hashes[offset:offset + count]
+    return np.unique((hashes >> np.uint64(32)) ^ (hashes & _MAX_HASH))
+
+
+def _mod_mersenne(values):
+    """values mod 2^61 - 1, for values below 2^64"""
+    values = (values & _MERSENNE_PRIME) + (values >> np.uint64(61))
+    return np.where(values >= _MERSENNE_PRIME, values - _MERSENNE_PRIME, values)
+
+
+def _universal_hash(a, b, x):
+    """(a * x + b) mod 2^61 - 1 without uint64 overflow, for a, b < 2^61 and x < 2^32.
+
+    a is split into 29 high and 32 low bits: a_low * x fits in 64 bits, and
+    a_high * x * 2^32 is reduced using 2^61 = 1 (mod 2^61 - 1).
+    """
+    high = (a >> np.uint64(32)) * x  # < 2^61
+    high = (high >> np.uint64(29)) + ((high & _LOW_29) << np.uint64(32))
+    low = _mod_mersenne((a & _MAX_HASH) * x)
+    return _mod_mersenne(high + low + b)
+
+
+class MinHasher:
+    """MinHash signatures from universal hashes (a * x + b) mod p, computed for a chunk of texts at once"""
+
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, int(_MERSENNE_PRIME), size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, int(_MERSENNE_PRIME), size=(num_perm, 1), dtype=np.uint64)
+
+    def signatures(self, texts, max_cells=1 << 22):
+        """(texts, num_perm) uint32 signatures; the (perm, shingle) matrix is kept under max_cells entries"""
+        shingles = [shingle_hashes(text, self.shingle_size) for text in texts]
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        start = 0
+        while start < len(shingles):
+            # Take as many texts as fit in the matrix budget (at least one)
+            stop, cells = start, 0
+            while stop < len(shingles) and (stop == start or cells + len(shingles[stop]) * self.num_perm <= max_cells):
+                cells += len(shingles[stop]) * self.num_perm
+                stop += 1
+            values = np.concatenate(shingles[start:stop])
+            permuted = _universal_hash(self.a, self.b, values) & _MAX_HASH
+            offsets = np.cumsum([0] + [len(s) for s in shingles[start:stop - 1]])
+            result[start:stop] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            start = stop
+        return result
+
+
+def band_keys(signatures, bands):
+    """One 64-bit key per (text, band); texts sharing any key become candidate duplicates"""
+    rows = signatures.shape[1] // bands
+    banded = signatures[:, :bands * rows].reshape(len(signatures), bands, rows).astype(np.uint64)
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for row in range(rows):
+            keys = keys * _SHINGLE_BASE + banded[:, :, row]
+    return keys
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1; the smallest index of a set is its root"""
+
+    def __init__(self, n):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]  # Path halving
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+    def roots(self):
+        return np.array([self.find(i) for i in range(len(self.parent))], dtype=np.int64)
+
+
+def find_clusters(path, field="text", num_perm=128, bands=16, threshold=0.8, shingle_size=5, chunk_size=2000,
+                  seed=1, key="claim"):
+    """Cluster the records of `path` by estimated Jaccard similarity of their `field` text.
+
+    Records are read in chunks; only the LSH band keys (8 bytes per band per
+    record) stay in memory, and the signatures go to a temporary memory-mapped
+    file. Candidate pairs from the bands are kept only if their signatures
+    agree on at least `threshold` of the positions.
+
+    Returns two arrays with one entry per record: the index of the first record
+    of its cluster, and the cluster id. The id is the smallest key_hash() of
+    the cluster's members, so it depends only on their content: it doesn't
+    change when records are inserted or reordered, and a split on it stays stable.
+    """
+    hasher = MinHasher(num_perm, shingle_size, seed)
+    keys = []
+    record_hashes = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        signature_path = os.path.join(tmp_dir, "signatures.bin")
+        with open(signature_path, "wb") as f:
+            texts = []
+            for record in read_records(path):
+                texts.append(_text_of(record, field))
+                record_hashes.append(key_hash(record, key, field))
+                if len(texts) == chunk_size:
+                    signatures = hasher.signatures(texts)
+                    signatures.tofile(f)
+                    keys.append(band_keys(signatures, bands))
+                    texts = []
+            if texts:
+                signatures = hasher.signatures(texts)
+                signatures.tofile(f)
+                keys.append(band_keys(signatures, bands))
+        if not keys:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+        keys = np.concatenate(keys)
+        signatures = np.memmap(signature_path, dtype=np.uint32, mode="r", shape=(len(keys), num_perm))
+
+        clusters = UnionFind(len(keys))
+        min_agreement = int(np.ceil(threshold * num_perm))
+        for band in range(bands):
+            order = np.argsort(keys[:, band], kind="stable")
+            sorted_keys = keys[order, band]
+            # Runs of equal keys: [starts[k], ends[k]) in `order`
+            boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(order)]))
+            for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+                members = order[start:end]
+                first = members[0]
+                agreement = (signatures[members[1:]] == signatures[first]).sum(axis=1)
+                for member in members[1:][agreement >= min_agreement]:
+                    clusters.union(first, member)
+        del signatures
+        roots = clusters.roots()
+
+    record_hashes = np.array(record_hashes, dtype=np.uint64)
+    cluster_ids = np.full(len(roots), np.iinfo(np.uint64).max, dtype=np.uint64)
+    np.minimum.at(cluster_ids, roots, record_hashes)
+    return roots, cluster_ids[roots]
+
+
+def annotate(input_path, output_path, roots, cluster_ids, drop_duplicates=False):
+    """Stream the records again, adding their `cluster` id; with drop_duplicates keep only each cluster's first"""
+    def records():
+        for i, record in enumerate(read_records(input_path)):
+            if drop_duplicates and roots[i] != i:
+                continue
+            record["cluster"] = f"{int(cluster_ids[i]):016x}"
+            yield record
+    return write_records(output_path, records())
+
+
+def group_split(input_path, train_path, test_path, test_size=0.2, seed=42):
+    """Split records that carry a `cluster` so every cluster lands on one side"""
+    counts = split_dataset(input_path, {"train": train_path, "test": test_path}, key="cluster",
+                           test_size=test_size, seed=seed)
+    return counts["train"], counts["test"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate samples with MinHash/LSH.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cluster = commands.add_parser("cluster", help="Add a `cluster` field to every record")
+    cluster.add_argument("input")
+    cluster.add_argument("output")
+    cluster.add_argument("--field", default="text", help="Text field to compare (lists of strings are joined)")
+    cluster.add_argument("--threshold", type=float, default=0.8, help="Estimated Jaccard similarity for duplicates")
+    cluster.add_argument("--num-perm", type=int, default=128)
+    cluster.add_argument("--bands", type=int, default=16)
+    cluster.add_argument("--shingle-size", type=int, default=5, help="Words per shingle")
+    cluster.add_argument("--chunk-size", type=int, default=2000)
+    cluster.add_argument("--key", default="claim", help="Field whose hash names a cluster (see split.py --key)")
+    cluster.add_argument("--drop-duplicates", action="store_true", help="Keep only the first record of each cluster")
+    split = commands.add_parser("split", help="Group-aware train/test split of clustered records")
+    split.add_argument("input")
+    split.add_argument("train")
+    split.add_argument("test")
+    split.add_argument("--test-size", type=float, default=0.2)
+    split.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.command == "cluster":
+        start = time.perf_counter()
+        roots, cluster_ids = find_clusters(args.input, args.field, args.num_perm, args.bands, args.threshold,
+                                           args.shingle_size, args.chunk_size, key=args.key)
+        written = annotate(args.input, args.output, roots, cluster_ids, args.drop_duplicates)
+        sizes = np.bincount(roots) if len(roots) else np.zeros(0, dtype=np.int64)
+        print(f"{len(roots)} records, {int((sizes > 1).sum())} duplicate clusters covering "
+              f"{int(sizes[sizes > 1].sum())} records, in {time.perf_counter() - start:.1f}s")
+        print(f"{written} records written to {args.output}")
+    else:
+        train_count, test_count = group_split(args.input, args.train, args.test, args.test_size, args.seed)
+        print(f"Training set saved to {args.train}, with {train_count} samples.")
+        print(f"Testing set saved to {args.test}, with {test_count} samples.")
@@ -1,34 +1,21 @@
-import json
-import re
+from cleaning import CLAIM_RULES, clean_file
 
-# 你的数据集文件名
-INPUT_FILE = "results.json"
-OUTPUT_FILE = "new_result.json"
+# 你的数据集文件名（.jsonl 为 JSON lines，其他为 JSON 数组）
+INPUT_FILE = "results.jsonl"
+OUTPUT_FILE = "new_result.jsonl"
 
-# 正则表达式匹配 "(Screenshot from ...)" 形式的文本
-screenshot_pattern = re.compile(r'\(Screenshot from .*?\)')
-
-def clean_claims(claims):
-    """ 去除 claims 列表中的所有 '(Screenshot from ...)' 片段 """
-    return [screenshot_pattern.sub('', claim).strip() for claim in claims]
+# 清理规则按顺序执行；CLAIM_RULES 去除 "(Screenshot from ...)" 形式的文本
+RULES = CLAIM_RULES
+FIELDS = ("claims",)
+WORKERS = None  # 进程数，None 表示使用全部 CPU 核
+CHUNK_SIZE = 1000  # 每个进程一次处理的条数
 
 def process_dataset(input_file, output_file):
-    # 读取 JSON 文件
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    # 遍历所有数据项，清理 `claims` 字段
-    for item in data:
-        if "claims" in item and isinstance(item["claims"], list):
-            item["claims"] = clean_claims(item["claims"])
+    # 分块并行清理，逐条读取和写出，内存占用与数据集大小无关
+    count, _ = clean_file(input_file, output_file, RULES, FIELDS, WORKERS, CHUNK_SIZE)
 
-    # 保存清理后的 JSON 数据
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-
-    print(f"✅ 处理完成！清理后的数据已保存到 {output_file}")
+    print(f"✅ 处理完成！{count} 条数据已清理并保存到 {output_file}")
 
 # 运行数据处理
 if __name__ == "__main__":
     process_dataset(INPUT_FILE, OUTPUT_FILE)
-
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import re
+
+from generation_cache import model_fingerprint
+
+DEFAULT_RUNS_DIR = "./eval_runs"
+
+
+def dataset_hash(texts):
+    """sha256 of the prompts in order, so any change to the evaluated samples starts a new run"""
+    digest = hashlib.sha256()
+    for text in texts:
+        encoded = text.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class RunCheckpoint:
+    """Responses of one generation run, appended to <run dir>/outputs.jsonl as they are produced.
+
+    The run directory is named after a hash of the manifest (model fingerprint,
+    dataset hash, generation params), so restarting the same run finds its
+    outputs and only a different model, dataset or setting starts from scratch.
+    """
+
+    def __init__(self, runs_dir, manifest):
+        key = hashlib.sha256(json.dumps(manifest, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+        name = re.sub(r"[^\w.-]+", "_", os.path.basename(manifest["model"].rstrip("/")) or "model")
+        self.directory = os.path.join(runs_dir, f"{name}-{key}")
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        self.outputs_path = os.path.join(self.directory, "outputs.jsonl")
+        self.manifest = manifest
+
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self.manifest_path):
+            with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=4)
+            os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    @classmethod
+    def for_generation(cls, runs_dir, model, texts, **params):
+        """Checkpoint of generating `texts` with `model`; params are everything else that changes the responses"""
+        manifest = {
+            "model": getattr(model, "name_or_path", None) or model.config._name_or_path,
+            "model_fingerprint": model_fingerprint(model),
+            "dataset_sha256": dataset_hash(texts),
+            "samples": len(texts),
+            "params": params,
+        }
+        return cls(runs_dir, manifest)
+
+    def completed(self):
+        """{sample index: response} already on disk. A line cut short by a crash is dropped from the file"""
+        responses = {}
+        if not os.path.exists(self.outputs_path):
+            return responses
+        valid_bytes = 0
+        with open(self.outputs_path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                responses[record["index"]] = record["response"]
+                valid_bytes += len(line)
+        if valid_bytes != os.path.getsize(self.outputs_path):
+            with open(self.outputs_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        return responses
+
+    def clear(self):
+        """Forget the responses on disk, so the run starts over"""
+        with open(self.outputs_path, "w", encoding="utf-8"):
+            pass
+
+    def append(self, items):
+        """Write (index, response) pairs and flush them to disk before returning"""
+        with open(self.outputs_path, "a", encoding="utf-8") as f:
+            for index, response in items:
+                f.write(json.dumps({"index": index, "response": response}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
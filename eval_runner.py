@@ -0,0 +1,234 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from datasets import load_dataset
+
+from eval_checkpoint import DEFAULT_RUNS_DIR
+from generation import EVAL_PROMPT_PREFIX, generate_responses
+from generation_cache import DEFAULT_CACHE_PATH, GenerationCache
+from metrics import registry
+from model_loading import estimate_model_bytes, inference_mode, load_model, release_memory
+from prefix_cache import prefix_cache_for
+from rouge_engine import format_ci, score_pairs
+from speculative import load_draft_model
+
+
+class MemoryBudget:
+    """Admit models only while the sum of their estimated sizes fits in the budget"""
+
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+    def _fits(self, size):
+        if self.budget_bytes is None or self.in_use == 0:
+            return True  # No budget, or nothing else loaded: an oversized model still runs on its own
+        return size is not None and self.in_use + size <= self.budget_bytes
+
+    def acquire(self, size):
+        with self.condition:
+            self.condition.wait_for(lambda: self._fits(size))
+            # Unknown sizes reserve the whole budget so they never share memory
+            self.in_use += size if size is not None else (self.budget_bytes or 0)
+            return self.in_use
+
+    def release(self, size):
+        with self.condition:
+            self.in_use -= size if size is not None else (self.budget_bytes or 0)
+            self.condition.notify_all()
+
+
+def _model_spec(spec):
+    """Models are given as a path or as {"path": ..., "tokenizer": ..., "load_kwargs": {...}, "draft": ...}.
+
+    "draft" is the path of a smaller model with the same tokenizer that drafts tokens for this one.
+    """
+    return {"path": spec} if isinstance(spec, str) else dict(spec)
+
+
+def _spec_bytes(spec):
+    """Estimated memory of a model spec, including its draft model; None if unknown"""
+    size = estimate_model_bytes(spec["path"])
+    if size is not None and spec.get("draft"):
+        draft_size = estimate_model_bytes(spec["draft"])
+        size = size + draft_size if draft_size is not None else None
+    return size
+
+
+def _generate(model_name, spec, test_data, settings, draft_stats):
+    """Load one model (and its draft model), generate with it and free it before returning"""
+    cache = GenerationCache(settings["cache_path"]) if settings["cache_path"] else None
+    print(f"Loading {model_name} model...")
+    load_kwargs = spec.get("load_kwargs", settings["load_kwargs"])
+    model, tokenizer = load_model(spec["path"], spec.get("tokenizer"), **load_kwargs)
+    prefix_cache = draft = None
+    try:
+        if spec.get("draft"):
+            print(f"Loading draft model {spec['draft']}...")
+            draft = load_draft_model(spec["draft"], **load_kwargs)
+        # The per-sample loop reuses the key/values of the instruction every sample starts with
+        elif settings["prompt_prefix"] and settings["batch_size"] <= 1:
+            prefix_cache = prefix_cache_for(model, tokenizer, settings["prompt_prefix"])
+        print(f"Generating responses with {model_name}...")
+        return generate_responses(
+            model, tokenizer, test_data,
+            max_input_length=settings["max_input_length"],
+            max_new_tokens=settings["max_new_tokens"],
+            batch_size=settings["batch_size"],
+            cache=cache,
+            refresh=settings["refresh_cache"],
+            prefix_cache=prefix_cache,
+            draft=draft,
+            checkpoint_dir=settings["checkpoint_dir"],
+            checkpoint_every=settings["checkpoint_every"]
+        )
+    finally:
+        if draft is not None:
+            draft_stats[model_name] = draft.stats()
+            print(f"{model_name} draft acceptance: {draft_stats[model_name]}")
+        del model, tokenizer, prefix_cache, draft
+        release_memory()
+        if cache is not None:
+            cache.close()
+
+
+def evaluate_models(models, dataset_path, output_path, max_input_length=128, max_new_tokens=50, batch_size=8,
+                    max_concurrent=1, memory_budget_bytes=None, cache_path=DEFAULT_CACHE_PATH, refresh_cache=False,
+                    load_kwargs=None, prompt_prefix=EVAL_PROMPT_PREFIX, checkpoint_dir=DEFAULT_RUNS_DIR,
+                    checkpoint_every=32):
+    """Generate with every model in `models` ({name: spec}) and write one JSON results file.
+
+    Models are loaded, used and freed one at a time by default. With
+    max_concurrent > 1 several run at once, but only while their estimated
+    sizes fit in memory_budget_bytes. The first model is the baseline the
+    others are compared against with a paired bootstrap. With batch_size=1 the
+    key/values of prompt_prefix are computed once per model and reused.
+
+    Responses are checkpointed under checkpoint_dir every checkpoint_every
+    samples, so rerunning after a crash or preemption only generates what is
+    missing. checkpoint_dir=None turns this off.
+    """
+    settings = {
+        "max_input_length": max_input_length,
+        "max_new_tokens": max_new_tokens,
+        "batch_size": batch_size,
+        "cache_path": cache_path,
+        "refresh_cache": refresh_cache,
+        "load_kwargs": load_kwargs or {"device_map": "auto"},
+        "prompt_prefix": prompt_prefix,
+        "checkpoint_dir": checkpoint_dir,
+        "checkpoint_every": checkpoint_every,
+        "inference_mode": inference_mode(),
+    }
+    specs = {name: _model_spec(spec) for name, spec in models.items()}
+
+    # Load the test dataset
+    test_data = load_dataset("json", data_files=dataset_path, split="train")
+    # Get the reference answers from the test dataset
+    references = [sample["text"] for sample in test_data]
+
+    budget = MemoryBudget(memory_budget_bytes)
+    timings = {}
+    draft_stats = {}
+
+    def run(model_name):
+        # Hub sizes come over the network; without a budget they would only be thrown away
+        size = _spec_bytes(specs[model_name]) if memory_budget_bytes is not None else None
+        budget.acquire(size)
+        start = time.perf_counter()
+        try:
+            return _generate(model_name, specs[model_name], test_data, settings, draft_stats)
+        finally:
+            timings[model_name] = time.perf_counter() - start
+            budget.release(size)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrent)) as executor:
+        futures = {name: executor.submit(run, name) for name in specs}
+        responses = {name: future.result() for name, future in futures.items()}
+
+    # Score after every model is released, so the scoring pool forks a small process
+    rouge_results = {}
+    for model_name in specs:
+        print(f"Computing ROUGE scores for {model_name}...")
+        rouge_results[model_name] = score_pairs(references, responses[model_name])
+        print(f"{model_name} ROUGE scores: {rouge_results[model_name].mean()}")
+
+    baseline = next(iter(specs))
+    results = {
+        "dataset": dataset_path,
+        "samples": len(references),
+        "settings": {key: value for key, value in settings.items() if key != "cache_path"},
+        "baseline": baseline,
+        "models": {},
+    }
+    for model_name, rouge_result in rouge_results.items():
+        entry = {
+            "path": specs[model_name]["path"],
+            "rouge": rouge_result.mean(),
+            "precision": rouge_result.mean("precision"),
+            "recall": rouge_result.mean("recall"),
+            "ci95": format_ci(rouge_result.bootstrap_ci()),
+            "generation_seconds": round(timings[model_name], 2),
+            # Per-request token counts and latencies of the generate calls (cached responses aren't counted)
+            "latency": registry.snapshot(model=specs[model_name]["path"]),
+        }
+        if model_name in draft_stats:
+            entry["draft"] = {"path": specs[model_name]["draft"], **draft_stats[model_name]}
+        if model_name != baseline:
+            entry["p_value_vs_baseline"] = rouge_result.paired_bootstrap(rouge_results[baseline])
+        results["models"][model_name] = entry
+
+    # Save the results to a JSON file
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, ensure_ascii=False, indent=4)
+    print(f"Results saved to {output_path}")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate with several models and compare their ROUGE scores.")
+    parser.add_argument("--model", action="append", required=True, metavar="NAME=PATH",
+                        help="Model to evaluate; repeat for each model. The first one is the baseline.")
+    parser.add_argument("--draft", action="append", default=[], metavar="NAME=PATH",
+                        help="Smaller model that drafts tokens for model NAME (speculative decoding)")
+    parser.add_argument("--dataset", default="./test_dataset.json")
+    parser.add_argument("--output", default="rouge_results.json")
+    parser.add_argument("--max-input-length", type=int, default=128)
+    parser.add_argument("--max-new-tokens", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-concurrent", type=int, default=1, help="Models generating at the same time")
+    parser.add_argument("--memory-budget-gb", type=float, default=None,
+                        help="Estimated weight memory allowed across concurrently loaded models")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Generation cache file; empty to disable")
+    parser.add_argument("--refresh-cache", action="store_true", help="Regenerate and overwrite cached responses")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_RUNS_DIR,
+                        help="Where responses are checkpointed so an interrupted run resumes; empty to disable")
+    parser.add_argument("--checkpoint-every", type=int, default=32, help="Samples generated between checkpoints")
+    parser.add_argument("--device-map", default="auto")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    models = dict(spec.split("=", 1) if "=" in spec else (spec, spec) for spec in args.model)
+    for name, draft_path in (spec.split("=", 1) for spec in args.draft):
+        models[name] = {"path": models[name], "draft": draft_path}
+    evaluate_models(
+        models,
+        args.dataset,
+        args.output,
+        max_input_length=args.max_input_length,
+        max_new_tokens=args.max_new_tokens,
+        batch_size=args.batch_size,
+        max_concurrent=args.max_concurrent,
+        memory_budget_bytes=int(args.memory_budget_gb * 1024 ** 3) if args.memory_budget_gb else None,
+        cache_path=args.cache or None,
+        refresh_cache=args.refresh_cache,
+        checkpoint_dir=args.checkpoint_dir or None,
+        checkpoint_every=args.checkpoint_every,
+        load_kwargs={"device_map": args.device_map}
+    )
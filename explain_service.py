@@ -0,0 +1,187 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+from metrics import registry, timed_generate
+
+
+class QueueFull(Exception):
+    """Raised when a request arrives while the wait queue is already at its limit"""
+
+
+class RequestQueue:
+    """Bounded request queue: at most `concurrency` generations run, at most `max_waiting` wait"""
+
+    def __init__(self, concurrency=1, max_waiting=16):
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.slots = threading.Semaphore(concurrency)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+
+    def depth(self):
+        with self.lock:
+            return {"running": self.running, "waiting": self.waiting, "max_waiting": self.max_waiting}
+
+    @contextmanager
+    def slot(self):
+        """Wait for a free generation slot, or raise QueueFull if too many requests are waiting"""
+        with self.lock:
+            if self.waiting >= self.max_waiting:
+                raise QueueFull(f"{self.waiting} requests are already waiting")
+            self.waiting += 1
+        start = time.perf_counter()
+        self.slots.acquire()
+        registry.observe("queue_wait_seconds", time.perf_counter() - start)
+        with self.lock:
+            self.waiting -= 1
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running -= 1
+            self.slots.release()
+
+
+class _StopOnEvent(StoppingCriteria):
+    """Stop generating once the request is abandoned (e.g. the user closed the page)"""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
+
+
+# Every prompt starts with this text; a PrefixCache of it skips recomputing it per request
+PROMPT_PREFIX = "Provide a detailed explanation to help verify the following claim:\n\nClaim: "
+
+
+def build_prompt(claim):
+    # Construct the input prompt
+    return (
+        f"{PROMPT_PREFIX}{claim}\n\n"
+        "Explanation:"
+    )
+
+
+def _cached_prefix(inputs, prefix_cache):
+    """generate() kwargs reusing the prefix's key/values when the prompt starts with it"""
+    if prefix_cache is None:
+        return {}
+    past_key_values = prefix_cache.past_key_values(inputs["input_ids"][0])
+    return {} if past_key_values is None else {"past_key_values": past_key_values}
+
+
+def _generate(model, tokenizer, draft, **kwargs):
+    """model.generate, with a DraftModel (see speculative.py) proposing tokens when one is given; timed in metrics"""
+    generate = model.generate if draft is None else partial(draft.generate, model, tokenizer)
+    return timed_generate(model, generate, **kwargs)
+
+
+def generate_explanation(model, tokenizer, claim, max_length=300, temperature=0.7, prefix_cache=None, draft=None):
+    """Explanation for one claim. With a draft model the prefix cache is not used:
+    assisted generation rebuilds both models' caches from the full prompt."""
+    # Convert the input prompt to model input
+    inputs = tokenizer(build_prompt(claim), return_tensors="pt").to(model.device)
+
+    # Generate output using the model
+    outputs = _generate(
+        model, tokenizer, draft,
+        **inputs,
+        **_cached_prefix(inputs, None if draft else prefix_cache),
+        max_length=max_length,
+        temperature=temperature,
+        top_p=0.9,
+        do_sample=True,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+
+    # Decode the generated text
+    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+
+def generate_explanations(model, tokenizer, claims, max_length=300, temperature=0.7):
+    """Generate explanations for several claims in one left-padded batch.
+
+    Each row keeps the max_length budget it would have had on its own: the batch
+    runs long enough for the shortest prompt, and every row is cut back to
+    max_length tokens counted from its own first prompt token.
+    """
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+    try:
+        inputs = tokenizer([build_prompt(claim) for claim in claims], return_tensors="pt", padding=True).to(model.device)
+    finally:
+        tokenizer.padding_side = padding_side
+
+    prompt_lengths = inputs["attention_mask"].sum(dim=1).tolist()
+    padded_length = inputs["input_ids"].shape[1]
+    max_new_tokens = max_length - min(prompt_lengths)
+    if max_new_tokens <= 0:
+        # Every prompt already fills max_length, exactly like a single max_length call
+        return [tokenizer.decode(row, skip_special_tokens=True) for row in inputs["input_ids"]]
+
+    outputs = timed_generate(
+        model, model.generate,
+        **inputs,
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+        top_p=0.9,
+        do_sample=True,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+
+    explanations = []
+    for row, prompt_length in zip(outputs, prompt_lengths):
+        start = padded_length - prompt_length
+        explanations.append(tokenizer.decode(row[start:start + max_length], skip_special_tokens=True))
+    return explanations
+
+
+def stream_explanation(model, tokenizer, claim, max_length=300, temperature=0.7, prefix_cache=None, draft=None):
+    """Yield the explanation decoded so far each time the model produces new text"""
+    inputs = tokenizer(build_prompt(claim), return_tensors="pt").to(model.device)
+    # Keep the prompt in the output so the final text matches generate_explanation
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=False, skip_special_tokens=True)
+    cancelled = threading.Event()
+    errors = []
+
+    def run():
+        try:
+            _generate(
+                model, tokenizer, draft,
+                **inputs,
+                **_cached_prefix(inputs, None if draft else prefix_cache),
+                max_length=max_length,
+                temperature=temperature,
+                top_p=0.9,
+                do_sample=True,
+                eos_token_id=tokenizer.eos_token_id,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([_StopOnEvent(cancelled)]),
+            )
+        except Exception as e:
+            errors.append(e)
+            streamer.end()  # Unblock the consumer
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    explanation = ""
+    try:
+        for text in streamer:
+            explanation += text
+            yield explanation
+    finally:
+        cancelled.set()
+        thread.join()
+    if errors:
+        raise errors[0]
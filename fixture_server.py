@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "politifact")
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Serve saved politifact pages; a listing page's ?page=N maps to page-N.html"""
+
+    delay = 0.0  # Seconds added to every response to imitate network latency
+
+    def translate_path(self, path):
+        parts = urlsplit(path)
+        page = parse_qs(parts.query).get("page")
+        if page:
+            path = parts.path.rstrip("/") + f"/page-{page[0]}.html"
+        return super().translate_path(path)
+
+    def send_head(self):
+        if self.delay:
+            time.sleep(self.delay)
+        return super().send_head()
+
+    def log_message(self, format, *args):
+        pass  # Keep crawl output readable
+
+
+@contextmanager
+def serve_fixtures(directory=FIXTURE_DIR, delay=0.0, port=0):
+    """Serve `directory` on localhost in a background thread and yield its base URL"""
+    handler = type("Handler", (FixtureHandler,), {"delay": delay})
+
+    def make_handler(*args, **kwargs):
+        return handler(*args, directory=directory, **kwargs)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # Point a scraper at http://127.0.0.1:8000/factchecks/list/ to crawl the fixture pages
+    with serve_fixtures(port=8000) as base_url:
+        print(f"Serving {FIXTURE_DIR} at {base_url}")
+        threading.Event().wait()
@@ -0,0 +1,172 @@
+from functools import partial
+
+import torch
+from tqdm import tqdm  # Import tqdm for the progress bar
+
+from eval_checkpoint import RunCheckpoint
+from generation_cache import decoding_settings, model_fingerprint
+from metrics import timed_generate
+
+# Instruction every test_dataset.json sample starts with; its key/values can be cached with a PrefixCache
+EVAL_PROMPT_PREFIX = '[INST]Please evaluate the following claim "'
+
+
+def length_buckets(lengths, batch_size):
+    """Group sample indices into batches of similar length so padding waste stays small"""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def _generate_one_by_one(model, tokenizer, texts, max_input_length, max_new_tokens, progress, prefix_cache=None,
+                         draft=None):
+    responses = []
+    device = next(model.parameters()).device  # Get the device where the model is located
+    for input_text in texts:
+        # Truncate input text to fit within the model's input limit
+        inputs = tokenizer(
+            input_text,
+            return_tensors="pt",
+            truncation=True,
+            max_length=max_input_length  # Limit input length
+        )
+        # Move inputs to the model's device
+        inputs = {key: value.to(device) for key, value in inputs.items()}
+        # Reuse the shared instruction prefix's key/values instead of recomputing them
+        if prefix_cache is not None and draft is None:
+            past_key_values = prefix_cache.past_key_values(inputs["input_ids"][0])
+            if past_key_values is not None:
+                inputs["past_key_values"] = past_key_values
+
+        # Use max_new_tokens instead of max_length
+        generate = model.generate if draft is None else partial(draft.generate, model, tokenizer)
+        outputs = timed_generate(
+            model, generate,
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.eos_token_id
+        )
+        responses.append(tokenizer.decode(outputs[0], skip_special_tokens=True))
+        progress.update(1)
+    return responses
+
+
+def _generate_batched(model, tokenizer, texts, max_input_length, max_new_tokens, batch_size, progress):
+    device = next(model.parameters()).device
+
+    # Decoder-only models must be padded on the left so generation continues right after the prompt
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+
+    # Tokenize once up front; the lengths decide the buckets
+    encodings = tokenizer(texts, truncation=True, max_length=max_input_length)
+    lengths = [len(ids) for ids in encodings["input_ids"]]
+
+    responses = [None] * len(texts)
+    try:
+        for batch_indices in length_buckets(lengths, batch_size):
+            batch = tokenizer.pad(
+                {key: [encodings[key][i] for i in batch_indices] for key in ("input_ids", "attention_mask")},
+                padding=True,
+                return_tensors="pt"
+            )
+            batch = {key: value.to(device) for key, value in batch.items()}
+
+            with torch.no_grad():
+                outputs = timed_generate(
+                    model, model.generate,
+                    **batch,
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=tokenizer.eos_token_id
+                )
+
+            # Put every result back at its original position
+            for i, text in zip(batch_indices, tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+                responses[i] = text
+            progress.update(len(batch_indices))
+    finally:
+        tokenizer.padding_side = padding_side
+
+    return responses
+
+
+def generate_responses(model, tokenizer, test_data, max_input_length=128, max_new_tokens=50, batch_size=1,
+                       cache=None, refresh=False, prefix_cache=None, draft=None, checkpoint_dir=None,
+                       checkpoint_every=32):
+    """Generate one response per sample, returned in dataset order.
+
+    With batch_size=1 every sample is generated on its own. Larger batch sizes
+    sort the prompts into length buckets, left-pad each batch and generate it in
+    a single call; greedy outputs are the same as in the per-sample loop.
+
+    When a GenerationCache is given, samples whose (model, truncated prompt,
+    decoding params) were generated before are served from it and only the rest
+    are generated. refresh=True ignores cached entries and overwrites them.
+
+    A PrefixCache (see prefix_cache.py) lets the per-sample loop skip the
+    prefill of a prompt prefix shared by every sample; batched generation
+    left-pads every row differently and does not use it.
+
+    With a DraftModel (see speculative.py) the small model drafts tokens that
+    the large one verifies. Assisted generation runs one prompt at a time, so
+    batch_size and prefix_cache are ignored; greedy responses are unchanged, so
+    cached entries stay valid.
+
+    With checkpoint_dir, responses are appended to a run directory there every
+    checkpoint_every samples (see eval_checkpoint.py). Calling again with the
+    same model, samples and generation params skips the samples already on disk.
+    refresh=True starts the run's checkpoint over as well.
+    """
+    texts = [sample["text"] for sample in test_data]  # Input text from the test dataset
+    responses = [None] * len(texts)
+
+    keys = None
+    decoding = decoding_settings(model, pad_token_id=tokenizer.eos_token_id)
+    if cache is not None:
+        model_id = model_fingerprint(model)
+        prompts = tokenizer(texts, truncation=True, max_length=max_input_length)["input_ids"]
+        keys = [cache.key(model_id, ids, max_input_length, max_new_tokens, decoding) for ids in prompts]
+        if not refresh:
+            cached = cache.get_many(keys)
+            responses = [cached.get(key) for key in keys]
+            print(f"Generation cache: {len(cached)} of {len(texts)} responses cached")
+
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = RunCheckpoint.for_generation(
+            checkpoint_dir, model, texts,
+            max_input_length=max_input_length, max_new_tokens=max_new_tokens, decoding=decoding
+        )
+        if refresh:
+            checkpoint.clear()
+        done = checkpoint.completed()
+        for i, response in done.items():
+            responses[i] = response
+        print(f"Checkpoint {checkpoint.directory}: {len(done)} of {len(texts)} responses already generated")
+
+    pending = [i for i, response in enumerate(responses) if response is None]
+    if not pending:
+        return responses
+
+    # Without a checkpoint everything is generated in one go, as before
+    step = checkpoint_every if checkpoint is not None else len(pending)
+    with tqdm(total=len(pending), desc="Generating responses", unit="sample") as progress:  # Progress bar for generating responses
+        for start in range(0, len(pending), step):
+            chunk = pending[start:start + step]
+            chunk_texts = [texts[i] for i in chunk]
+            if batch_size <= 1 or draft is not None:
+                generated = _generate_one_by_one(model, tokenizer, chunk_texts, max_input_length, max_new_tokens,
+                                                 progress, prefix_cache, draft)
+            else:
+                generated = _generate_batched(model, tokenizer, chunk_texts, max_input_length, max_new_tokens,
+                                              batch_size, progress)
+
+            for i, text in zip(chunk, generated):
+                responses[i] = text
+            if cache is not None:
+                cache.put_many(model_id, [(keys[i], responses[i]) for i in chunk])
+            if checkpoint is not None:
+                checkpoint.append([(i, responses[i]) for i in chunk])
+
+    return responses
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = "./generation_cache.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB of cached responses
+
+# Files that identify a local checkpoint's weights and configuration
+_FINGERPRINT_SUFFIXES = (".json", ".safetensors", ".bin", ".model")
+
+
+def model_fingerprint(model):
+    """Identify a model by its path plus a revision hash.
+
+    Hub models use the commit hash recorded when they were downloaded. Local
+    checkpoint directories hash the name, size and modification time of their
+    config and weight files, so re-training into the same folder changes the key.
+    """
+    name = getattr(model, "name_or_path", None) or model.config._name_or_path
+    revision = getattr(model.config, "_commit_hash", None)
+    if os.path.isdir(name):
+        digest = hashlib.sha256()
+        for file_name in sorted(os.listdir(name)):
+            if file_name.endswith(_FINGERPRINT_SUFFIXES):
+                stat = os.stat(os.path.join(name, file_name))
+                digest.update(f"{file_name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+        revision = digest.hexdigest()
+    return f"{name}@{revision or 'unknown'}"
+
+
+def decoding_settings(model, **overrides):
+    """The decoding parameters generate() will actually use: the model's generation config plus call overrides"""
+    settings = model.generation_config.to_diff_dict()
+    settings.pop("transformers_version", None)
+    settings.update(overrides)
+    return settings
+
+
+class GenerationCache:
+    """On-disk cache of generated responses with size-based LRU eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, created REAL, last_access REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS generations_last_access ON generations (last_access)")
+        self.connection.commit()
+
+    @staticmethod
+    def key(model_id, prompt_ids, max_input_length, max_new_tokens, decoding):
+        """Hash of everything that determines a response: model, exact truncated prompt and decoding params"""
+        payload = json.dumps(
+            [model_id, list(prompt_ids), max_input_length, max_new_tokens, decoding],
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: response} for the keys that are cached"""
+        found = {}
+        now = time.time()
+        keys = list(keys)
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, response FROM generations WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(rows)
+            self.connection.execute(
+                f"UPDATE generations SET last_access = ? WHERE key IN ({placeholders})", [now, *chunk]
+            )
+        self.connection.commit()
+        return found
+
+    def put_many(self, model_id, items):
+        """Store (key, response) pairs, then evict the least recently used entries if over budget"""
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO generations (key, model, response, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+            [(key, model_id, response, len(response.encode("utf-8")), now, now) for key, response in items]
+        )
+        self.connection.commit()
+        self.evict()
+
+    def total_bytes(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used responses until the cache fits in max_bytes"""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        removed = 0
+        freed = 0
+        for key, size in self.connection.execute("SELECT key, size FROM generations ORDER BY last_access").fetchall():
+            if freed >= excess:
+                break
+            self.connection.execute("DELETE FROM generations WHERE key = ?", (key,))
+            freed += size
+            removed += 1
+        self.connection.commit()
+        return removed
+
+    def clear(self, model_id=None):
+        if model_id is None:
+            self.connection.execute("DELETE FROM generations")
+        else:
+            self.connection.execute("DELETE FROM generations WHERE model = ?", (model_id,))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,193 @@
+from functools import lru_cache
+
+from cleaning import clean_text
+
+# Fastest first; the first installed one is the default
+BACKENDS = ("selectolax", "lxml", "html.parser")
+
+QUOTE_CLASS = "m-statement__quote"
+SUMMARY_CLASS = "c-title"
+ARTICLE_CLASS = "m-textblock"
+
+# Text BeautifulSoup's get_text() leaves out, so every backend leaves it out too
+_NON_TEXT_TAGS = ("script", "style", "template")
+
+
+def _has_class(class_attr, name):
+    return bool(class_attr) and name in class_attr.split()
+
+
+@lru_cache(maxsize=None)
+def available_backends():
+    backends = []
+    for backend, module in (("selectolax", "selectolax.parser"), ("lxml", "lxml.html"), ("html.parser", "bs4")):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        backends.append(backend)
+    return tuple(backends)
+
+
+def default_backend():
+    backends = available_backends()
+    if not backends:
+        raise ImportError("No HTML parser available: install selectolax, lxml or beautifulsoup4.")
+    return backends[0]
+
+
+def _accept_title(text, title_contains):
+    return bool(text) and (title_contains is None or title_contains in text)
+
+
+def _result(title, summary, paragraphs):
+    # Extract the claims (excluding all quotes and the title itself)
+    claims = [text for text in paragraphs if text and text != title]
+    return {'title': title, 'summary': summary, 'claims': claims}
+
+
+def _extract_html_parser(html, title_contains):
+    """Reference implementation: BeautifulSoup with the pure-Python parser and CSS selects"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    title = None
+    for quote in soup.select('div.m-statement__quote'):
+        text = clean_text(quote.get_text())
+        if _accept_title(text, title_contains):
+            title = text
+            break
+
+    summary = None
+    summary_tag = soup.select_one('h1.c-title')
+    if summary_tag:
+        summary = clean_text(summary_tag.get_text())
+
+    paragraphs = []
+    main_content = soup.select_one('article.m-textblock')
+    if main_content:
+        paragraphs = [clean_text(p.get_text()) for p in main_content.select('p:not(.m-statement__quote)')]
+
+    return _result(title, summary, paragraphs)
+
+
+def _collect_lxml_text(element, parts):
+    if element.text:
+        parts.append(element.text)
+    for child in element:
+        # Comments and processing instructions have a non-string tag; only their tail is text
+        if isinstance(child.tag, str) and child.tag not in _NON_TEXT_TAGS:
+            _collect_lxml_text(child, parts)
+        if child.tail:
+            parts.append(child.tail)
+
+
+def _lxml_text(element):
+    parts = []
+    _collect_lxml_text(element, parts)
+    return "".join(parts)
+
+
+def _extract_lxml(html, title_contains):
+    """Walk the lxml tree once, collecting title, summary and article paragraphs on the way"""
+    import lxml.html
+    from lxml import etree
+
+    root = lxml.html.document_fromstring(html)
+    title = None
+    summary = None
+    paragraphs = []
+    article = None  # The first article.m-textblock
+    article_done = False
+
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue
+        if event == "end":
+            if element is article:
+                article_done = True
+                if title is not None and summary is not None:
+                    break  # Nothing left to find
+            continue
+
+        class_attr = element.get("class")
+        if tag == "div" and title is None and _has_class(class_attr, QUOTE_CLASS):
+            text = clean_text(_lxml_text(element))
+            if _accept_title(text, title_contains):
+                title = text
+        elif tag == "h1" and summary is None and _has_class(class_attr, SUMMARY_CLASS):
+            summary = clean_text(_lxml_text(element))
+        elif tag == "article" and article is None and _has_class(class_attr, ARTICLE_CLASS):
+            article = element
+        elif tag == "p" and article is not None and not article_done and not _has_class(class_attr, QUOTE_CLASS):
+            paragraphs.append(clean_text(_lxml_text(element)))
+
+    return _result(title, summary, paragraphs)
+
+
+def _selectolax_text(node):
+    parts = []
+    for child in node.iter(include_text=True):
+        if child.tag == "-text":
+            parts.append(child.text_content or "")
+        elif child.tag not in _NON_TEXT_TAGS and child.tag != "_comment":
+            parts.append(_selectolax_text(child))
+    return "".join(parts)
+
+
+def _inside(node, ancestor):
+    parent = node.parent
+    while parent is not None:
+        if parent.mem_id == ancestor.mem_id:
+            return True
+        parent = parent.parent
+    return False
+
+
+def _extract_selectolax(html, title_contains):
+    """Walk the selectolax (lexbor/Modest) tree once in document order"""
+    from selectolax.parser import HTMLParser
+
+    tree = HTMLParser(html)
+    title = None
+    summary = None
+    paragraphs = []
+    article = None
+
+    for node in tree.root.traverse():
+        tag = node.tag
+        if tag not in ("div", "h1", "article", "p"):
+            continue
+        class_attr = node.attributes.get("class")
+        if tag == "div" and title is None and _has_class(class_attr, QUOTE_CLASS):
+            text = clean_text(_selectolax_text(node))
+            if _accept_title(text, title_contains):
+                title = text
+        elif tag == "h1" and summary is None and _has_class(class_attr, SUMMARY_CLASS):
+            summary = clean_text(_selectolax_text(node))
+        elif tag == "article" and article is None and _has_class(class_attr, ARTICLE_CLASS):
+            article = node
+        elif tag == "p" and article is not None and not _has_class(class_attr, QUOTE_CLASS) and _inside(node, article):
+            paragraphs.append(clean_text(_selectolax_text(node)))
+
+    return _result(title, summary, paragraphs)
+
+
+_EXTRACTORS = {
+    "selectolax": _extract_selectolax,
+    "lxml": _extract_lxml,
+    "html.parser": _extract_html_parser,
+}
+
+
+def extract_article(html, backend=None, title_contains=None):
+    """Extract {'title', 'summary', 'claims'} from a politifact article page.
+
+    title is the first non-empty div.m-statement__quote (optionally the first
+    one containing `title_contains`), summary is h1.c-title, and claims are the
+    non-quote paragraphs of the first article.m-textblock. Every backend gives
+    the same result; backend=None uses the fastest one installed.
+    """
+    return _EXTRACTORS[backend or default_backend()](html, title_contains)
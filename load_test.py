@@ -0,0 +1,98 @@
+import argparse
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import explain_service
+from dataset_io import read_records
+from micro_batching import MicroBatcher
+from model_loading import load_model
+
+# Claims are quoted inside the instruction of every test sample
+claim_pattern = re.compile(r'Please evaluate the following claim "(.*?)"\.', re.S)
+
+
+def claims_from_dataset(path, limit):
+    claims = []
+    for sample in read_records(path):
+        match = claim_pattern.search(sample["text"])
+        if match:
+            claims.append(match.group(1))
+        if len(claims) >= limit:
+            break
+    return claims
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def run_load(handler, claims, rate, concurrency, seed=0):
+    """Send claims with Poisson arrivals at `rate` requests/s; return per-request latencies and wall time"""
+    rng = random.Random(seed)
+    latencies = []
+    lock = threading.Lock()
+
+    def send(claim, arrival):
+        handler(claim)
+        with lock:
+            latencies.append(time.perf_counter() - arrival)
+
+    start = time.perf_counter()
+    next_arrival = start
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for claim in claims:
+            next_arrival += rng.expovariate(rate)
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, claim, time.perf_counter())
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, elapsed, extra=""):
+    print(
+        f"{name:>8}: {len(latencies) / elapsed:7.2f} req/s | "
+        f"p50 {percentile(latencies, 50) * 1000:8.1f} ms | p99 {percentile(latencies, 99) * 1000:8.1f} ms {extra}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic bursty load against generate_explanation.")
+    parser.add_argument("--model", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--dataset", default="./test_dataset.json")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--rate", type=float, default=50.0, help="Mean arrival rate in requests/s")
+    parser.add_argument("--concurrency", type=int, default=32, help="Client threads")
+    parser.add_argument("--max-length", type=int, default=160)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument("--device-map", default="cpu")
+    args = parser.parse_args()
+
+    model, tokenizer = load_model(args.model, device_map=args.device_map)
+    claims = claims_from_dataset(args.dataset, args.requests)
+
+    # Batch-of-one: one generate call per claim, serialized like the UI's single mode
+    generate_lock = threading.Lock()
+
+    def single(claim):
+        with generate_lock:
+            return explain_service.generate_explanation(model, tokenizer, claim, max_length=args.max_length)
+
+    latencies, elapsed = run_load(single, claims, args.rate, args.concurrency)
+    report("single", latencies, elapsed)
+
+    batcher = MicroBatcher(
+        lambda batch: explain_service.generate_explanations(model, tokenizer, batch, max_length=args.max_length),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms
+    )
+    latencies, elapsed = run_load(batcher, claims, args.rate, args.concurrency)
+    batcher.close()
+    report("batch", latencies, elapsed, f"| mean batch {batcher.stats()['mean_batch_size']:.2f}")
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import torch
+from transformers import AutoTokenizer
+
+from dataset_io import read_records
+from model_loading import estimate_model_bytes, load_model, release_memory
+from TestLoss import compute_test_loss, compute_test_loss_dynamic, pad_token_id
+from token_cache import DEFAULT_CACHE_DIR, TokenStore, load_token_store
+
+CHECKPOINT_PATTERN = re.compile(r"^checkpoint-(\d+)$")
+FIELDS = ["step", "epoch", "train_loss", "test_loss", "checkpoint"]
+
+
+def _trainer_state(path):
+    state_path = os.path.join(path, "trainer_state.json")
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_checkpoints(run_dir):
+    """[{path, step, epoch}] for every checkpoint-N directory of a training run, in step order.
+
+    A directory without checkpoints is treated as a single finished model.
+    """
+    checkpoints = []
+    for name in os.listdir(run_dir):
+        match = CHECKPOINT_PATTERN.match(name)
+        path = os.path.join(run_dir, name)
+        if match and os.path.isdir(path):
+            state = _trainer_state(path)
+            checkpoints.append({"path": path, "step": state.get("global_step", int(match.group(1))),
+                                "epoch": state.get("epoch")})
+    if not checkpoints:
+        state = _trainer_state(run_dir)
+        checkpoints.append({"path": run_dir, "step": state.get("global_step"), "epoch": state.get("epoch")})
+    return sorted(checkpoints, key=lambda checkpoint: checkpoint["step"] or 0)
+
+
+def checkpoint_bytes(path):
+    """Estimated memory of a checkpoint; LoRA adapter checkpoints also need their base model"""
+    size = estimate_model_bytes(path)
+    adapter_config = os.path.join(path, "adapter_config.json")
+    if size is not None and os.path.exists(adapter_config):
+        with open(adapter_config, "r", encoding="utf-8") as f:
+            base = json.load(f).get("base_model_name_or_path")
+        base_size = estimate_model_bytes(base) if base else None
+        size = size + base_size if base_size is not None else None
+    return size
+
+
+def train_loss_history(checkpoints, train_log=None):
+    """Logged training losses [{step, epoch, loss}]: from train_log (trainer JSONL lines such as
+    test_loss.json) if given, else from the log_history of the latest checkpoint"""
+    if train_log:
+        entries = read_records(train_log)
+    else:
+        entries = _trainer_state(checkpoints[-1]["path"]).get("log_history", []) if checkpoints else []
+    # Only the periodic "loss" entries; the final "train_loss" is an average over the whole run
+    return [{"step": entry.get("step"), "epoch": entry.get("epoch"), "loss": entry["loss"]}
+            for entry in entries if "loss" in entry and entry.get("epoch") is not None]
+
+
+def train_loss_at(history, step, epoch):
+    """The last training loss logged at or before a checkpoint, matched on step when both sides have it"""
+    loss = None
+    for entry in history:
+        if step is not None and entry["step"] is not None:
+            reached = entry["step"] <= step
+        else:
+            reached = epoch is not None and entry["epoch"] <= epoch + 1e-9
+        if reached:
+            loss = entry["loss"]
+    return loss
+
+
+def _checkpoint_loss(checkpoint_path, tokenizer_path, store_directory, settings):
+    """Load one checkpoint, compute its test loss on the shared token store and free it"""
+    store = TokenStore(store_directory)
+    model, tokenizer = load_model(checkpoint_path, tokenizer_path, torch_dtype=torch.float16,
+                                  device_map=settings["device_map"])
+    try:
+        pad_id = pad_token_id(tokenizer)
+        if settings["padding_mode"] == "dynamic":
+            return compute_test_loss_dynamic(model, store, pad_id, settings["max_batch_tokens"])
+        return compute_test_loss(model, store, pad_id, settings["batch_size"], settings["max_length"])
+    finally:
+        del model, tokenizer
+        release_memory()
+
+
+def sweep(run_dir, dataset_path, output_path, tokenizer_path=None, train_log=None, max_length=512,
+          padding_mode="dynamic", max_batch_tokens=8192, batch_size=4, max_workers=1, memory_budget_bytes=None,
+          cache_dir=DEFAULT_CACHE_DIR, device_map="auto"):
+    """Test loss of every checkpoint of a run, written as a step/epoch table next to the training loss.
+
+    The dataset is tokenized once into the shared token cache. Checkpoints are
+    evaluated one at a time, or in up to max_workers spawned processes when
+    memory_budget_bytes holds that many copies of the largest checkpoint.
+    """
+    checkpoints = find_checkpoints(run_dir)
+    if tokenizer_path is None:
+        has_tokenizer = os.path.exists(os.path.join(run_dir, "tokenizer_config.json"))
+        tokenizer_path = run_dir if has_tokenizer else checkpoints[-1]["path"]
+
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path, trust_remote_code=True)
+    store = load_token_store(dataset_path, tokenizer, max_length, cache_dir)
+    settings = {"max_length": max_length, "padding_mode": padding_mode, "max_batch_tokens": max_batch_tokens,
+                "batch_size": batch_size, "device_map": device_map}
+
+    workers = 1
+    if max_workers > 1 and memory_budget_bytes:
+        sizes = [checkpoint_bytes(checkpoint["path"]) for checkpoint in checkpoints]
+        if None not in sizes:
+            workers = max(1, min(max_workers, len(checkpoints), memory_budget_bytes // max(sizes)))
+    print(f"Evaluating {len(checkpoints)} checkpoints with {workers} worker(s)...")
+
+    losses = {}
+    if workers == 1:
+        for checkpoint in checkpoints:
+            losses[checkpoint["path"]] = _checkpoint_loss(checkpoint["path"], tokenizer_path, store.directory, settings)
+            print(f"{checkpoint['path']}: {losses[checkpoint['path']]}")
+    else:
+        # spawn: CUDA can't be used in forked children
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+            futures = {
+                executor.submit(_checkpoint_loss, checkpoint["path"], tokenizer_path, store.directory, settings):
+                    checkpoint["path"]
+                for checkpoint in checkpoints
+            }
+            for future in as_completed(futures):
+                losses[futures[future]] = future.result()
+                print(f"{futures[future]}: {losses[futures[future]]}")
+
+    history = train_loss_history(checkpoints, train_log)
+    rows = [
+        {
+            "step": checkpoint["step"],
+            "epoch": checkpoint["epoch"],
+            "train_loss": train_loss_at(history, checkpoint["step"], checkpoint["epoch"]),
+            "test_loss": losses[checkpoint["path"]],
+            "checkpoint": os.path.basename(checkpoint["path"]),
+        }
+        for checkpoint in checkpoints
+    ]
+    with open(output_path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Loss curve saved to {output_path}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the test loss of every checkpoint of a training run.")
+    parser.add_argument("run_dir", help="Training output directory containing checkpoint-N directories")
+    parser.add_argument("--dataset", default="./test_dataset.json")
+    parser.add_argument("--output", default="test_loss_sweep.csv")
+    parser.add_argument("--tokenizer", default=None, help="Defaults to the run directory or its last checkpoint")
+    parser.add_argument("--train-log", default=None,
+                        help="Trainer log lines (e.g. test_loss.json); defaults to the last checkpoint's trainer_state.json")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--padding-mode", choices=("dynamic", "max_length"), default="dynamic")
+    parser.add_argument("--max-batch-tokens", type=int, default=8192)
+    parser.add_argument("--batch-size", type=int, default=4, help="Batch size in max_length mode")
+    parser.add_argument("--max-workers", type=int, default=1, help="Checkpoints evaluated at the same time")
+    parser.add_argument("--memory-budget-gb", type=float, default=None,
+                        help="Estimated weight memory allowed across concurrently loaded checkpoints")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--device-map", default="auto")
+    args = parser.parse_args()
+
+    sweep(
+        args.run_dir,
+        args.dataset,
+        args.output,
+        tokenizer_path=args.tokenizer,
+        train_log=args.train_log,
+        max_length=args.max_length,
+        padding_mode=args.padding_mode,
+        max_batch_tokens=args.max_batch_tokens,
+        batch_size=args.batch_size,
+        max_workers=args.max_workers,
+        memory_budget_bytes=int(args.memory_budget_gb * 1024 ** 3) if args.memory_budget_gb else None,
+        cache_dir=args.cache_dir,
+        device_map=args.device_map
+    )
@@ -0,0 +1,230 @@
+import bisect
+import json
+import resource
+import threading
+import time
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+# Bucket upper bounds; everything above the last one lands in the overflow (+Inf) bucket
+TOKEN_BUCKETS = (1, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1)
+
+HISTOGRAMS = {
+    "prompt_tokens": TOKEN_BUCKETS,
+    "generated_tokens": TOKEN_BUCKETS,
+    "time_to_first_token_seconds": LATENCY_BUCKETS,
+    "inter_token_seconds": TOKEN_LATENCY_BUCKETS,
+    "total_seconds": LATENCY_BUCKETS,
+    "queue_wait_seconds": LATENCY_BUCKETS,
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated inside the bucket they fall in"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value, n=1):
+        self.counts[bisect.bisect_left(self.buckets, value)] += n
+        self.count += n
+        self.sum += value * n
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                # The observed extremes are tighter bounds than the bucket edges
+                lower = max(self.buckets[i - 1] if i else 0.0, self.min)
+                upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+                return round(lower + (upper - lower) * (rank - seen) / count, 6)
+            seen += count
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "min": None if self.min is None else round(self.min, 6),
+            "max": None if self.max is None else round(self.max, 6),
+            **{f"p{int(q * 100)}": self.quantile(q) for q in (0.5, 0.9, 0.99)},
+        }
+
+
+def _peak_memory():
+    """Peak resident memory of this process, and peak allocated GPU memory when CUDA is in use"""
+    peak = {"peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}  # ru_maxrss is in KB
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        peak["peak_gpu_bytes"] = max(torch.cuda.max_memory_allocated(i) for i in range(torch.cuda.device_count()))
+    return peak
+
+
+class MetricsRegistry:
+    """Generation histograms per model, shared by every thread of the process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.requests = {}
+        self.gauges = {}
+        self.started = time.time()
+
+    def observe(self, name, value, model="", n=1):
+        with self.lock:
+            key = (name, model)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(HISTOGRAMS[name])
+            self.histograms[key].observe(value, n)
+
+    def count_request(self, model, n=1):
+        with self.lock:
+            self.requests[model] = self.requests.get(model, 0) + n
+
+    def add_gauges(self, prefix, read):
+        """Export read()'s {name: number} as gauges named <prefix>_<name>, read on every scrape or snapshot"""
+        with self.lock:
+            self.gauges[prefix] = read
+
+    def _read_gauges(self):
+        with self.lock:
+            sources = sorted(self.gauges.items())
+        return {f"{prefix}_{name}": value for prefix, read in sources for name, value in read().items()
+                if isinstance(value, (int, float))}
+
+    def snapshot(self, model=None):
+        """{model: {"requests": n, histogram name: summary}} plus process memory; one model's entry if given"""
+        with self.lock:
+            models = {}
+            for (name, label), histogram in sorted(self.histograms.items()):
+                models.setdefault(label, {"requests": self.requests.get(label, 0)})[name] = histogram.snapshot()
+        if model is not None:
+            return models.get(model, {})
+        return {"uptime_seconds": round(time.time() - self.started, 1), "models": models, **self._read_gauges(),
+                **_peak_memory()}
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            lines.append("# TYPE generation_requests_total counter")
+            for model, count in sorted(self.requests.items()):
+                lines.append(f'generation_requests_total{{model="{model}"}} {count}')
+            for name in HISTOGRAMS:
+                histograms = [(label, h) for (key, label), h in sorted(self.histograms.items()) if key == name]
+                if not histograms:
+                    continue
+                lines.append(f"# TYPE generation_{name} histogram")
+                for model, histogram in histograms:
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f'generation_{name}_bucket{{model="{model}",le="{bound}"}} {cumulative}')
+                    lines.append(f'generation_{name}_sum{{model="{model}"}} {histogram.sum}')
+                    lines.append(f'generation_{name}_count{{model="{model}"}} {histogram.count}')
+        for name, value in self._read_gauges().items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        for name, value in _peak_memory().items():
+            lines.append(f"# TYPE process_{name} gauge")
+            lines.append(f"process_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump_jsonl(self, path):
+        """Append the current snapshot to a JSON Lines file"""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), **self.snapshot()}) + "\n")
+
+    def start_dump(self, path, interval=60):
+        """Dump a snapshot every `interval` seconds from a daemon thread"""
+        def run():
+            while True:
+                time.sleep(interval)
+                self.dump_jsonl(path)
+
+        thread = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        thread.start()
+        return thread
+
+
+# Every generate call in the process records here
+registry = MetricsRegistry()
+
+
+class _TokenTimer(StoppingCriteria):
+    """Timestamps each decoding step: generate calls its stopping criteria once per step, after the new tokens"""
+
+    def __init__(self, prompt_length):
+        self.prompt_length = prompt_length
+        self.steps = []  # (time, tokens generated so far)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.steps.append((time.perf_counter(), input_ids.shape[1] - self.prompt_length))
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+
+def _generated_lengths(new_tokens, eos_token_id):
+    """Tokens each row really generated: up to and including its first end-of-sequence token"""
+    if eos_token_id is None:
+        return [new_tokens.shape[1]] * new_tokens.shape[0]
+    eos = torch.isin(new_tokens, torch.tensor(eos_token_id, device=new_tokens.device).flatten())
+    has_eos = eos.any(dim=1)
+    first = eos.int().argmax(dim=1) + 1
+    return torch.where(has_eos, first, torch.full_like(first, new_tokens.shape[1])).tolist()
+
+
+def timed_generate(model, generate, **kwargs):
+    """Call generate(**kwargs) (model.generate or a wrapper of it) and record one request per prompt row"""
+    input_ids = kwargs["input_ids"]
+    prompt_length = input_ids.shape[1]
+    timer = _TokenTimer(prompt_length)
+    kwargs["stopping_criteria"] = StoppingCriteriaList([*(kwargs.get("stopping_criteria") or []), timer])
+
+    start = time.perf_counter()
+    outputs = generate(**kwargs)
+    total = time.perf_counter() - start
+
+    label = getattr(model, "name_or_path", "") or ""
+    attention_mask = kwargs.get("attention_mask")
+    prompt_tokens = attention_mask.sum(dim=1).tolist() if attention_mask is not None else [prompt_length] * len(input_ids)
+    eos_token_id = kwargs.get("eos_token_id", model.generation_config.eos_token_id)
+    generated = _generated_lengths(outputs[:, prompt_length:], eos_token_id)
+
+    registry.count_request(label, len(prompt_tokens))
+    for prompt, new in zip(prompt_tokens, generated):
+        registry.observe("prompt_tokens", prompt, label)
+        registry.observe("generated_tokens", new, label)
+        registry.observe("total_seconds", total, label)
+    if timer.steps:
+        registry.observe("time_to_first_token_seconds", timer.steps[0][0] - start, label, n=len(prompt_tokens))
+        # One observation per token of every row, like time_to_first_token: a batch step counts once for each
+        # row that hasn't hit EOS yet. Steps that add several tokens at once (speculative decoding) spread
+        # their time over them
+        for (previous, before), (now, after) in zip(timer.steps, timer.steps[1:]):
+            tokens = sum(min(new, after) - before for new in generated if new > before)
+            if tokens:
+                registry.observe("inter_token_seconds", (now - previous) / (after - before), label, n=tokens)
+    return outputs
+
+
+def send_metrics(handler):
+    """Write the Prometheus page as the response of a BaseHTTPRequestHandler"""
+    body = registry.prometheus().encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Collect requests that arrive within a short window and process them as one batch.
+
+    `process_batch` takes a list of payloads and returns one result per payload,
+    in the same order. Each caller gets its own result back through a Future.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=20):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.processed = 0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, payload):
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self.requests.put((payload, future))
+        return future
+
+    def __call__(self, payload):
+        """Submit one payload and block until its result is ready"""
+        return self.submit(payload).result()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.processed,
+            "mean_batch_size": self.processed / self.batches if self.batches else 0.0,
+            "queued": self.requests.qsize(),
+        }
+
+    def close(self):
+        self._closed = True
+        self.requests.put(None)
+        self._worker.join()
+
+    def _collect(self, first):
+        """Take the first request plus whatever else arrives before the window closes"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.requests.put(None)  # Finish this batch, then stop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self.requests.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            futures = [future for _, future in batch]
+            try:
+                results = self.process_batch([payload for payload, _ in batch])
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            self.batches += 1
+            self.processed += len(batch)
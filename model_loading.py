@@ -0,0 +1,269 @@
+import argparse
+import gc
+import json
+import os
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from metrics import send_metrics
+
+_WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".pth")
+
+# One setting switches every entry point (UIs, ROUGE scripts, eval_runner) to CPU inference:
+#   default   each script's own device_map / dtype
+#   cpu       float32 on the CPU
+#   cpu-int8  int8 dynamic quantization of every Linear layer (torch.ao)
+#   cpu-int4  int4 weight-only quantization, grouped by 32 (needs torchao)
+INFERENCE_MODE_ENV = "MISINFO_INFERENCE_MODE"
+INFERENCE_MODES = ("default", "cpu", "cpu-int8", "cpu-int4")
+
+
+def estimate_model_bytes(model_path, overhead=1.2):
+    """Rough memory needed to hold a checkpoint: its weight files plus some headroom.
+
+    Local directories are measured on disk; Hub models use the file sizes listed
+    on the Hub (or the local cache). Returns None when the size can't be found.
+    """
+    if os.path.isdir(model_path):
+        sizes = {
+            name: os.path.getsize(os.path.join(model_path, name))
+            for name in os.listdir(model_path)
+            if name.endswith(_WEIGHT_SUFFIXES)
+        }
+    else:
+        try:
+            from huggingface_hub import HfApi
+            info = HfApi().model_info(model_path, files_metadata=True)
+            sizes = {s.rfilename: s.size or 0 for s in info.siblings if s.rfilename.endswith(_WEIGHT_SUFFIXES)}
+        except Exception:
+            return None
+
+    # Checkpoints often ship both formats; count only one of them
+    safetensors = [size for name, size in sizes.items() if name.endswith(".safetensors")]
+    total = sum(safetensors) if safetensors else sum(sizes.values())
+    return int(total * overhead) if total else None
+
+
+def inference_mode():
+    mode = os.environ.get(INFERENCE_MODE_ENV) or "default"
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"{INFERENCE_MODE_ENV}={mode!r}; expected one of {', '.join(INFERENCE_MODES)}")
+    return mode
+
+
+def _quantize_int8(model):
+    """Swap every nn.Linear for a dynamically quantized int8 one, a layer at a time.
+
+    Each layer is widened to float32 only while it is quantized, so peak memory
+    stays near the size of the checkpoint rather than its float32 size.
+    """
+    from torch.ao.quantization import quantize_dynamic
+
+    linears = [(name, module) for name, module in model.named_modules() if isinstance(module, torch.nn.Linear)]
+    for name, linear in linears:
+        parent_name, _, child_name = name.rpartition(".")
+        parent = model.get_submodule(parent_name) if parent_name else model
+        quantized = quantize_dynamic(torch.nn.Sequential(linear.float()), {torch.nn.Linear}, dtype=torch.qint8)
+        setattr(parent, child_name, quantized[0])
+    # Embeddings and norms feed float32 activations into the quantized layers
+    return model.float()
+
+
+def _quantize_int4(model):
+    try:
+        from torchao.quantization import IntxWeightOnlyConfig, PerGroup, quantize_
+    except ImportError:
+        raise ImportError(f"{INFERENCE_MODE_ENV}=cpu-int4 needs torchao: pip install torchao")
+    quantize_(model, IntxWeightOnlyConfig(weight_dtype=torch.int4, granularity=PerGroup(32)))
+    return model
+
+
+def load_model(model_path, tokenizer_path=None, mode=None, **load_kwargs):
+    """Load a causal LM and its tokenizer; load_kwargs go to from_pretrained (device_map, torch_dtype, ...).
+
+    mode (default: the MISINFO_INFERENCE_MODE environment variable) set to one
+    of the CPU modes replaces device_map and dtype and quantizes the weights.
+    """
+    mode = mode or inference_mode()
+    load_kwargs.setdefault("device_map", "auto")
+    if mode != "default":
+        load_kwargs["device_map"] = "cpu"
+        # int8 is quantized from the checkpoint's own dtype layer by layer; int4 kernels run in bfloat16
+        dtypes = {"cpu": torch.float32, "cpu-int8": "auto", "cpu-int4": torch.bfloat16}
+        load_kwargs.pop("torch_dtype", None)
+        load_kwargs["dtype"] = dtypes[mode]
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path or model_path, trust_remote_code=True)
+    model = AutoModelForCausalLM.from_pretrained(model_path, **load_kwargs)
+    model.eval()
+    if mode == "cpu-int8":
+        model = _quantize_int8(model)
+    elif mode == "cpu-int4":
+        model = _quantize_int4(model)
+    return model, tokenizer
+
+
+def release_memory():
+    """Return freed model memory to the allocator and the GPU"""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def save_snapshot(model, tokenizer, snapshot_dir):
+    """Save a loaded model as safetensors in its loaded dtype.
+
+    Loading the snapshot memory-maps the weights directly: no .bin unpickling
+    and no dtype conversion on the way in.
+    """
+    tmp_dir = snapshot_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    model.save_pretrained(tmp_dir, safe_serialization=True)
+    tokenizer.save_pretrained(tmp_dir)
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.replace(tmp_dir, snapshot_dir)
+
+
+class ModelNotReady(Exception):
+    """Raised when the model is requested before the background load has finished"""
+
+
+class ModelLoader:
+    """Load a model in a background thread so the caller (e.g. a UI) can start serving right away.
+
+    status() reports "loading", "warming up", "ready" or "failed". With a
+    snapshot_dir, the model is loaded from that safetensors snapshot when it
+    exists and saved there after the first load otherwise. `warmup` is
+    called with (model, tokenizer) before the model is reported ready.
+    """
+
+    def __init__(self, model_path, tokenizer_path=None, snapshot_dir=None, warmup=None, **load_kwargs):
+        self.model_path = model_path
+        self.tokenizer_path = tokenizer_path
+        self.snapshot_dir = snapshot_dir
+        self.warmup = warmup
+        self.load_kwargs = load_kwargs
+        self.state = "loading"
+        self.error = None
+        self.started = None
+        self.timings = {}
+        self.model = None
+        self.tokenizer = None
+        self.loaded = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+        self.thread.start()
+        return self
+
+    def _load(self):
+        try:
+            start = time.perf_counter()
+            use_snapshot = self.snapshot_dir is not None and os.path.isdir(self.snapshot_dir)
+            if use_snapshot:
+                model, tokenizer = load_model(self.snapshot_dir, **self.load_kwargs)
+            else:
+                model, tokenizer = load_model(self.model_path, self.tokenizer_path, **self.load_kwargs)
+            self.timings["load_seconds"] = round(time.perf_counter() - start, 2)
+
+            if self.warmup is not None:
+                self.state = "warming up"
+                start = time.perf_counter()
+                self.warmup(model, tokenizer)
+                self.timings["warmup_seconds"] = round(time.perf_counter() - start, 2)
+
+            self.model, self.tokenizer = model, tokenizer
+            self.state = "ready"
+            self.loaded.set()
+            print(f"Model ready: {self.status()}")
+
+            # Quantized CPU models are rebuilt from the checkpoint on every start
+            if self.snapshot_dir is not None and not use_snapshot and inference_mode() == "default":
+                start = time.perf_counter()
+                save_snapshot(model, tokenizer, self.snapshot_dir)
+                print(f"Snapshot saved to {self.snapshot_dir} in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            if self.state != "ready":
+                self.error = f"{type(e).__name__}: {e}"
+                self.state = "failed"
+                self.loaded.set()
+            print(f"Model loading failed: {e}" if self.state == "failed" else f"Saving the snapshot failed: {e}")
+
+    def ready(self):
+        return self.state == "ready"
+
+    def wait(self, timeout=None):
+        """Block until the model is ready or failed; returns ready()"""
+        self.loaded.wait(timeout)
+        return self.ready()
+
+    def get(self):
+        """(model, tokenizer), or ModelNotReady while loading or after a failure"""
+        if not self.ready():
+            raise ModelNotReady(self.describe())
+        return self.model, self.tokenizer
+
+    def status(self):
+        status = {"status": self.state, "model": self.model_path, **self.timings}
+        if self.started is not None and self.state in ("loading", "warming up"):
+            status["elapsed_seconds"] = round(time.perf_counter() - self.started, 1)
+        if self.error:
+            status["error"] = self.error
+        return status
+
+    def describe(self):
+        status = self.status()
+        if status["status"] == "failed":
+            return f"The model failed to load ({status['error']})."
+        if status["status"] != "ready":
+            return f"The model is {status['status']} ({status.get('elapsed_seconds', 0):.0f}s so far), please try again shortly."
+        return "The model is ready."
+
+    def serve_health(self, port=8081, host="0.0.0.0"):
+        """Answer GET /health with the status as JSON: 200 when ready, 503 otherwise.
+
+        GET /metrics serves the generation metrics (metrics.py) in the Prometheus format.
+        """
+        loader = self
+
+        class HealthHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") == "/metrics":
+                    send_metrics(self)
+                    return
+                if self.path.rstrip("/") not in ("/health", ""):
+                    self.send_error(404)
+                    return
+                body = json.dumps(loader.status()).encode("utf-8")
+                self.send_response(200 if loader.ready() else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Health checks would flood the log
+
+        server = ThreadingHTTPServer((host, port), HealthHandler)
+        threading.Thread(target=server.serve_forever, name="health", daemon=True).start()
+        return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a checkpoint into a safetensors snapshot that loads fast.")
+    parser.add_argument("model_path")
+    parser.add_argument("snapshot_dir")
+    parser.add_argument("--tokenizer", default=None)
+    parser.add_argument("--dtype", default="float16", help="torch dtype to store, e.g. float16 or bfloat16")
+    args = parser.parse_args()
+
+    model, tokenizer = load_model(args.model_path, args.tokenizer, mode="default", torch_dtype=getattr(torch, args.dtype),
+                                  device_map="cpu")
+    save_snapshot(model, tokenizer, args.snapshot_dir)
+    print(f"Snapshot saved to {args.snapshot_dir}")
@@ -0,0 +1,57 @@
+import copy
+import threading
+import weakref
+
+import torch
+from transformers import DynamicCache
+
+# Prefix caches already built, per model and prefix text
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+class PrefixCache:
+    """Key/values of a fixed prompt prefix, computed once and reused by every prompt that starts with it.
+
+    A prompt's tokens can differ from the prefix's at the boundary (e.g. "Claim: "
+    plus the claim's first word may merge into one token), so only the longest
+    common token prefix is reused and the rest of the prompt is prefilled as usual.
+    """
+
+    def __init__(self, model, tokenizer, prefix):
+        self.prefix = prefix
+        prefix_ids = tokenizer(prefix, return_tensors="pt")["input_ids"]
+        with torch.no_grad():
+            outputs = model(prefix_ids.to(model.device), past_key_values=DynamicCache(), use_cache=True)
+        self.cache = outputs.past_key_values
+        self.prefix_ids = prefix_ids[0].tolist()
+
+    def reusable_length(self, input_ids):
+        """How many leading tokens of `input_ids` (a 1-D sequence) can come from the cache"""
+        input_ids = input_ids.tolist() if hasattr(input_ids, "tolist") else list(input_ids)
+        length = 0
+        for cached, token in zip(self.prefix_ids, input_ids):
+            if cached != token:
+                break
+            length += 1
+        # generate needs at least one uncached prompt token to produce the first logits
+        return min(length, len(input_ids) - 1)
+
+    def past_key_values(self, input_ids, min_length=2):
+        """A private copy of the cache cut to the reusable length, or None if too little of the prefix matches"""
+        length = self.reusable_length(input_ids)
+        if length < min_length:
+            return None
+        cache = copy.deepcopy(self.cache)  # generate appends to it; the shared copy must stay untouched
+        if length < len(self.prefix_ids):
+            cache.crop(length - len(self.prefix_ids))  # A negative value drops that many tokens from the end
+        return cache
+
+
+def prefix_cache_for(model, tokenizer, prefix):
+    """The PrefixCache of `prefix` for this model, built on first use"""
+    with _caches_lock:
+        caches = _caches.setdefault(model, {})
+        if prefix not in caches:
+            caches[prefix] = PrefixCache(model, tokenizer, prefix)
+        return caches[prefix]
@@ -0,0 +1,103 @@
+import argparse
+import json
+import time
+
+import torch
+
+from dataset_io import read_records
+from generation import generate_responses
+from metrics import _generated_lengths
+from model_loading import INFERENCE_MODES, load_model, release_memory
+from rouge_engine import score_pairs
+
+
+def model_bytes(model):
+    """Bytes held by the model's weights, including quantized packed weights that aren't parameters"""
+    total = 0
+    for value in model.state_dict().values():
+        if isinstance(value, torch.Tensor):
+            total += value.nelement() * value.element_size()
+        elif isinstance(value, tuple):  # Packed int8 params are stored as (weight, bias)
+            total += sum(t.nelement() * t.element_size() for t in value if isinstance(t, torch.Tensor))
+    return total
+
+
+def count_generated_tokens(model):
+    """Wrap model.generate to count the tokens it produces, up to each row's first EOS; returns the counter dict"""
+    counter = {"tokens": 0}
+    generate = model.generate
+
+    def counting_generate(*args, **kwargs):
+        outputs = generate(*args, **kwargs)
+        prompt_length = kwargs["input_ids"].shape[1] if "input_ids" in kwargs else args[0].shape[1]
+        eos_token_id = kwargs.get("eos_token_id", model.generation_config.eos_token_id)
+        counter["tokens"] += sum(_generated_lengths(outputs[:, prompt_length:], eos_token_id))
+        return outputs
+
+    model.generate = counting_generate
+    return counter
+
+
+def evaluate_mode(model_path, mode, samples, max_input_length, max_new_tokens, batch_size, tokenizer_path=None):
+    start = time.perf_counter()
+    model, tokenizer = load_model(model_path, tokenizer_path, mode=mode)
+    load_seconds = time.perf_counter() - start
+    try:
+        counter = count_generated_tokens(model)
+        start = time.perf_counter()
+        responses = generate_responses(model, tokenizer, samples, max_input_length, max_new_tokens, batch_size)
+        seconds = time.perf_counter() - start
+        weight_bytes = model_bytes(model)
+    finally:
+        del model, tokenizer
+        release_memory()
+
+    rouge = score_pairs([sample["text"] for sample in samples], responses).mean()
+    return {
+        "mode": mode,
+        "rouge": rouge,
+        "tokens_per_second": counter["tokens"] / seconds if seconds else 0.0,
+        "seconds_per_sample": seconds / len(samples),
+        "weight_mb": weight_bytes / 1024 ** 2,
+        "load_seconds": load_seconds,
+    }
+
+
+def print_report(results):
+    print(f"{'mode':>10} {'rouge1':>8} {'rouge2':>8} {'rougeL':>8} {'tok/s':>9} {'s/sample':>9} {'weights MB':>11}")
+    for result in results:
+        rouge = result["rouge"]
+        print(f"{result['mode']:>10} {rouge['rouge1']:8.4f} {rouge['rouge2']:8.4f} {rouge['rougeL']:8.4f} "
+              f"{result['tokens_per_second']:9.1f} {result['seconds_per_sample']:9.3f} {result['weight_mb']:11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare ROUGE and generation speed across CPU inference modes.")
+    parser.add_argument("model_path")
+    parser.add_argument("--tokenizer", default=None)
+    parser.add_argument("--dataset", default="./test_dataset.json")
+    parser.add_argument("--samples", type=int, default=50, help="First N samples of the dataset")
+    parser.add_argument("--modes", nargs="+", default=["cpu", "cpu-int8", "cpu-int4"],
+                        choices=INFERENCE_MODES)
+    parser.add_argument("--max-input-length", type=int, default=128)
+    parser.add_argument("--max-new-tokens", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--output", default="quant_report.json")
+    args = parser.parse_args()
+
+    samples = []
+    for sample in read_records(args.dataset):
+        samples.append(sample)
+        if len(samples) == args.samples:
+            break
+
+    results = []
+    for mode in args.modes:
+        print(f"Evaluating {mode}...")
+        results.append(evaluate_mode(args.model_path, mode, samples, args.max_input_length, args.max_new_tokens,
+                                     args.batch_size, args.tokenizer))
+    print_report(results)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"model": args.model_path, "samples": len(samples), "results": results}, f, indent=4)
+    print(f"Report saved to {args.output}")
@@ -0,0 +1,144 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from cleaning import clean_text
+
+_punctuation = re.compile(r'[^\w\s]')
+
+
+def normalize_claim(claim):
+    """Clean the claim like the scrapers do, then ignore case and punctuation"""
+    return clean_text(_punctuation.sub(' ', clean_text(claim).casefold()))
+
+
+class EmbeddingIndex:
+    """Small in-memory cosine-similarity index over normalized claims.
+
+    Uses a sentence-transformers model when the package is installed; without it
+    the index stays empty and only exact (normalized) matches are served.
+    """
+
+    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", threshold=0.95):
+        self.threshold = threshold
+        self.keys = []
+        self.vectors = None
+        try:
+            import numpy as np
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            self.encoder = None
+            return
+        self.np = np
+        self.encoder = SentenceTransformer(model_name)
+
+    @property
+    def enabled(self):
+        return self.encoder is not None
+
+    def _embed(self, text):
+        return self.encoder.encode([text], normalize_embeddings=True)[0].astype(self.np.float32)
+
+    def add(self, key, text):
+        if not self.enabled:
+            return
+        vector = self._embed(text)[None, :]
+        self.vectors = vector if self.vectors is None else self.np.vstack([self.vectors, vector])
+        self.keys.append(key)
+
+    def remove(self, key):
+        if not self.enabled or key not in self.keys:
+            return
+        i = self.keys.index(key)
+        del self.keys[i]
+        self.vectors = self.np.delete(self.vectors, i, axis=0) if self.keys else None
+
+    def nearest(self, text, allowed):
+        """Most similar stored key accepted by `allowed`, if it clears the threshold"""
+        if not self.enabled or not self.keys:
+            return None
+        similarities = self.vectors @ self._embed(text)
+        for i in self.np.argsort(-similarities):
+            if similarities[i] < self.threshold:
+                return None
+            if allowed(self.keys[i]):
+                return self.keys[i]
+        return None
+
+
+class ResponseCache:
+    """LRU + TTL cache of explanations keyed on (model, decoding params, normalized claim)"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=24 * 3600, semantic_index=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_index = semantic_index
+        self.entries = OrderedDict()  # key -> (response, expires_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(claim, model_id, decoding):
+        return (model_id, json.dumps(decoding, sort_keys=True), normalize_claim(claim))
+
+    def _drop(self, key):
+        del self.entries[key]
+        if self.semantic_index is not None:
+            self.semantic_index.remove(key)
+
+    def _live(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < now:
+            self._drop(key)
+            return None
+        return entry[0]
+
+    def get(self, claim, model_id, decoding):
+        key = self.key(claim, model_id, decoding)
+        now = time.time()
+        with self.lock:
+            response = self._live(key, now)
+            if response is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return response
+
+            if self.semantic_index is not None:
+                # Near-duplicates only count when they were generated with the same model and params
+                neighbour = self.semantic_index.nearest(key[2], lambda other: other[:2] == key[:2])
+                response = self._live(neighbour, now) if neighbour is not None else None
+                if response is not None:
+                    self.entries.move_to_end(neighbour)
+                    self.semantic_hits += 1
+                    return response
+
+            self.misses += 1
+            return None
+
+    def put(self, claim, model_id, decoding, response):
+        key = self.key(claim, model_id, decoding)
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (response, time.time() + self.ttl_seconds)
+            if self.semantic_index is not None:
+                self.semantic_index.add(key, key[2])
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from rouge_score import rouge_scorer
+from tqdm import tqdm  # Import tqdm for the progress bar
+
+ROUGE_TYPES = ("rouge1", "rouge2", "rougeL")
+FIELDS = ("precision", "recall", "fmeasure")
+
+# One scorer per worker process, created by the pool initializer
+_worker_scorer = None
+_worker_rouge_types = ROUGE_TYPES
+
+
+def _init_worker(rouge_types, use_stemmer):
+    global _worker_scorer, _worker_rouge_types
+    _worker_rouge_types = tuple(rouge_types)
+    _worker_scorer = rouge_scorer.RougeScorer(list(rouge_types), use_stemmer=use_stemmer)
+
+
+def _score_chunk(start, references, hypotheses):
+    """Score one chunk of pairs into a (pairs, rouge types, P/R/F) array"""
+    scores = np.empty((len(references), len(_worker_rouge_types), len(FIELDS)), dtype=np.float32)
+    for i, (ref, hyp) in enumerate(zip(references, hypotheses)):
+        rouge_score = _worker_scorer.score(ref, hyp)
+        for j, rouge_type in enumerate(_worker_rouge_types):
+            scores[i, j] = tuple(rouge_score[rouge_type])  # (precision, recall, fmeasure)
+    return start, scores
+
+
+class RougeResult:
+    """Per-sample precision/recall/F for every ROUGE type, backed by one NumPy array"""
+
+    def __init__(self, scores, rouge_types=ROUGE_TYPES):
+        self.scores = scores  # shape: (samples, rouge types, P/R/F)
+        self.rouge_types = tuple(rouge_types)
+
+    def __len__(self):
+        return self.scores.shape[0]
+
+    def values(self, field="fmeasure"):
+        """(samples, rouge types) array for one of precision/recall/fmeasure"""
+        return self.scores[:, :, FIELDS.index(field)]
+
+    def mean(self, field="fmeasure"):
+        means = self.values(field).mean(axis=0, dtype=np.float64)
+        return {rouge_type: float(value) for rouge_type, value in zip(self.rouge_types, means)}
+
+    def _bootstrap_means(self, values, n_resamples, seed, chunk_size=200):
+        """Means of `values` over bootstrap resamples, shape (n_resamples, rouge types)"""
+        rng = np.random.default_rng(seed)
+        n = values.shape[0]
+        means = np.empty((n_resamples, values.shape[1]), dtype=np.float64)
+        # Resample in chunks so the (resamples, samples) index matrix stays small
+        for start in range(0, n_resamples, chunk_size):
+            stop = min(start + chunk_size, n_resamples)
+            indices = rng.integers(0, n, size=(stop - start, n))
+            means[start:stop] = values[indices].mean(axis=1, dtype=np.float64)
+        return means
+
+    def bootstrap_ci(self, field="fmeasure", n_resamples=1000, confidence=0.95, seed=0):
+        """Percentile bootstrap confidence interval of the mean for each ROUGE type"""
+        means = self._bootstrap_means(self.values(field), n_resamples, seed)
+        alpha = (1.0 - confidence) / 2.0
+        low, high = np.quantile(means, [alpha, 1.0 - alpha], axis=0)
+        return {rouge_type: (float(l), float(h)) for rouge_type, l, h in zip(self.rouge_types, low, high)}
+
+    def paired_bootstrap(self, other, field="fmeasure", n_resamples=1000, seed=0):
+        """Share of paired resamples where this result does not beat `other` (a one-sided p-value)"""
+        if len(self) != len(other):
+            raise ValueError("Paired bootstrap needs results over the same samples.")
+        diffs = self.values(field).astype(np.float64) - other.values(field)
+        means = self._bootstrap_means(diffs, n_resamples, seed)
+        p_values = (means <= 0).mean(axis=0)
+        return {rouge_type: float(p) for rouge_type, p in zip(self.rouge_types, p_values)}
+
+    def save(self, path):
+        np.savez_compressed(path, scores=self.scores, rouge_types=np.array(self.rouge_types))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["scores"], tuple(str(t) for t in data["rouge_types"]))
+
+
+def score_pairs(references, hypotheses, workers=None, chunk_size=256, rouge_types=ROUGE_TYPES, use_stemmer=True):
+    """Score (reference, hypothesis) pairs across a process pool, one scorer per worker"""
+    references = list(references)
+    hypotheses = list(hypotheses)
+    if len(references) != len(hypotheses):
+        raise ValueError("references and hypotheses must have the same length.")
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(references) <= chunk_size:
+        _init_worker(rouge_types, use_stemmer)
+        _, scores = _score_chunk(0, references, hypotheses)
+        return RougeResult(scores, rouge_types)
+
+    scores = np.empty((len(references), len(rouge_types), len(FIELDS)), dtype=np.float32)
+
+    # Fork where possible so workers never re-import the calling script
+    start_methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in start_methods else None)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(rouge_types, use_stemmer)
+    ) as executor:
+        futures = [
+            executor.submit(_score_chunk, start, references[start:start + chunk_size], hypotheses[start:start + chunk_size])
+            for start in range(0, len(references), chunk_size)
+        ]
+        with tqdm(total=len(references), desc="Computing ROUGE scores", unit="pair") as progress:  # Progress bar for computing ROUGE scores
+            for future in as_completed(futures):
+                start, chunk_scores = future.result()
+                scores[start:start + len(chunk_scores)] = chunk_scores
+                progress.update(len(chunk_scores))
+
+    return RougeResult(scores, rouge_types)
+
+
+def compute_rouge_scores(references, hypotheses, workers=None):
+    """Average ROUGE F-measure per type, as the ROUGE scripts have always reported it"""
+    return score_pairs(references, hypotheses, workers=workers).mean()
+
+
+def format_ci(ci):
+    return {rouge_type: [round(low, 4), round(high, 4)] for rouge_type, (low, high) in ci.items()}
@@ -1,6 +1,8 @@
 import requests
-from bs4 import BeautifulSoup
-import re
+
+from html_extract import extract_article
+
+html_backend = None  # None 表示自动选择已安装的最快解析器：selectolax、lxml 或 html.parser
 
 def extract_content(url):
     """精准提取目标内容"""
@@ -9,43 +11,13 @@ def extract_content(url):
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 精确提取标题
-        title_quote = None
-        for quote in soup.select('div.m-statement__quote'):
-            text = clean_text(quote.get_text())
-            if "Jonathan Simpson, the pilot of" in text:
-                title_quote = text
-                break
-        
-        # 提取 summary
-        summary = None
-        summary_tag = soup.select_one('h1.c-title')
-        if summary_tag:
-            summary = clean_text(summary_tag.get_text())
-
-        # 提取声明内容（排除所有quote）
-        claims = []
-        main_content = soup.select_one('article.m-textblock')
-        if main_content:
-            for p in main_content.select('p:not(.m-statement__quote)'):
-                text = clean_text(p.get_text())
-                if text and text != title_quote:
-                    claims.append(text)
-
-        return {'title': title_quote, 'summary': summary, 'claims': claims}
+        # 精确提取标题、summary 和声明内容（排除所有quote）
+        return extract_article(response.text, backend=html_backend, title_contains="Jonathan Simpson, the pilot of")
 
     except Exception as e:
         print(f"Error: {str(e)}")
         return {'title': None, 'summary': None, 'claims': []}
 
-def clean_text(text):
-    """强化文本清洗"""
-    text = re.sub(r'\s+', ' ', text)  # 合并空白字符
-    text = re.sub(r'[\xa0\u200b]', '', text)  # 移除特殊字符
-    return text.strip()
-
 def save_results(data, filename='results.txt'):
     """结构化保存结果"""
     with open(filename, 'w', encoding='utf-8') as f:
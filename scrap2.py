@@ -1,7 +1,24 @@
 import requests
 from bs4 import BeautifulSoup
-import re
 import json
+from urllib.parse import urljoin
+
+from crawl_state import CrawlState, content_hash, state_path_for
+from crawler import Crawler
+from dataset_io import write_records
+from html_extract import extract_article
+
+html_backend = None  # None 表示自动选择已安装的最快解析器：selectolax、lxml 或 html.parser
+
+def parse_article_links(html, page_url):
+    """从列表页 HTML 中提取文章链接"""
+    soup = BeautifulSoup(html, 'html.parser')
+    links = []
+    for a_tag in soup.select('div.m-statement__quote a'):
+        link = a_tag.get('href')
+        if link and link.startswith('/factchecks/'):
+            links.append(urljoin(page_url, link))
+    return links
 
 def get_article_links(base_url, pages=1):
     """从列表页抓取所有文章链接"""
@@ -12,78 +29,102 @@ def get_article_links(base_url, pages=1):
             url = f"{base_url}?page={page}"
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            for a_tag in soup.select('div.m-statement__quote a'):
-                link = a_tag.get('href')
-                if link and link.startswith('/factchecks/'):
-                    full_url = "https://www.politifact.com" + link
-                    articles.append(full_url)
+            articles.extend(parse_article_links(response.text, url))
 
     except Exception as e:
         print(f"Error fetching article links: {str(e)}")
-    
+
     return articles
 
+def parse_article(html):
+    """从文章页 HTML 中提取标题、summary 和声明内容"""
+    return extract_article(html, backend=html_backend)
+
 def extract_content(url):
     """从单篇文章抓取数据"""
     try:
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # 1. 精确提取标题
-        title_quote = None
-        for quote in soup.select('div.m-statement__quote'):
-            text = clean_text(quote.get_text())
-            if text:
-                title_quote = text
-                break
-
-        # 2. 提取 summary
-        summary = None
-        summary_tag = soup.select_one('h1.c-title')
-        if summary_tag:
-            summary = clean_text(summary_tag.get_text())
-
-        # 3. 提取声明内容（排除所有 quote）
-        claims = []
-        main_content = soup.select_one('article.m-textblock')
-        if main_content:
-            for p in main_content.select('p:not(.m-statement__quote)'):
-                text = clean_text(p.get_text())
-                if text and text != title_quote:
-                    claims.append(text)
+        data = parse_article(response.text)
 
         # 显示抓取成功的URL和标题
-        print(f"✅ {url} - {title_quote if title_quote else 'No Title'}")
+        print(f"✅ {url} - {data['title'] if data['title'] else 'No Title'}")
 
-        return {'url': url, 'title': title_quote, 'summary': summary, 'claims': claims}
+        return {'url': url, **data}
 
     except Exception as e:
         print(f"❌ Error extracting content from {url}: {str(e)}")
         return {'url': url, 'title': None, 'summary': None, 'claims': []}
 
-def clean_text(text):
-    """强化文本清洗"""
-    text = re.sub(r'\s+', ' ', text)  # 合并空白字符
-    text = re.sub(r'[\xa0\u200b]', '', text)  # 移除特殊字符
-    return text.strip()
+def crawl(base_url, pages=1, concurrency=8, per_host_rate=4.0):
+    """并发抓取列表页和文章页，结果保持串行抓取时的顺序"""
+    crawler = Crawler(concurrency=concurrency, per_host_rate=per_host_rate)
+    listing_urls = [f"{base_url}?page={page}" for page in range(1, pages + 1)]
+    results = []
+    try:
+        for result in crawler.crawl(listing_urls, parse_article_links, parse_article):
+            if result.error is None:
+                print(f"✅ {result.url} - {result.data['title'] if result.data['title'] else 'No Title'}")
+                results.append((result.index, {'url': result.url, **result.data}))
+            else:
+                print(f"❌ Error extracting content from {result.url}: {str(result.error)}")
+                results.append((result.index, {'url': result.url, 'title': None, 'summary': None, 'claims': []}))
+    finally:
+        crawler.close()
+    return [data for _, data in sorted(results, key=lambda item: item[0])]
+
+def crawl_incremental(base_url, pages=1, filename='results2.jsonl', state_path=None,
+                      recheck_after=24 * 3600, concurrency=8, per_host_rate=4.0):
+    """增量抓取：只抓取新增或有变化的文章，并追加写入 JSON lines 文件"""
+    crawler = Crawler(concurrency=concurrency, per_host_rate=per_host_rate)
+    # 状态按输出文件分开保存，否则另一个爬虫会把已抓过的文章当作未变化而跳过
+    state = CrawlState(state_path or state_path_for(filename))
+    listing_urls = [f"{base_url}?page={page}" for page in range(1, pages + 1)]
+    counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'failed': 0}
+    try:
+        with open(filename, 'a', encoding='utf-8') as f:
+            results = crawler.crawl(listing_urls, parse_article_links, parse_article,
+                                    state=state, recheck_after=recheck_after)
+            for result in results:
+                if result.error is not None:
+                    # 不写入状态，下次运行时重试
+                    print(f"❌ Error extracting content from {result.url}: {str(result.error)}")
+                    counts['failed'] += 1
+                    continue
+                if result.not_modified:
+                    state.touch(result.url)
+                    counts['unchanged'] += 1
+                    continue
+
+                data = {'url': result.url, **result.data}
+                new_hash = content_hash(data)
+                if not state.is_changed(result.url, new_hash):
+                    state.record(result.url, result.etag, result.last_modified, new_hash)
+                    counts['unchanged'] += 1
+                    continue
+
+                counts['new' if state.get(result.url) is None else 'changed'] += 1
+                print(f"✅ {result.url} - {result.data['title'] if result.data['title'] else 'No Title'}")
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+                f.flush()
+                # 数据写入输出文件后再记录状态
+                state.record(result.url, result.etag, result.last_modified, new_hash)
+    finally:
+        crawler.close()
+        state.close()
+    return counts
 
 def save_results(data_list, filename='results2.json'):
     """保存结果为 JSON"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data_list, f, ensure_ascii=False, indent=4)
+    write_records(filename, data_list)
 
 if __name__ == "__main__":
     base_url = 'https://www.politifact.com/factchecks/list/'
-    article_links = get_article_links(base_url, pages=2)  # 抓取前2页的文章链接
-
-    extracted_data = [extract_content(url) for url in article_links]
+    # 增量抓取前2页：只抓取新增或有变化的文章
+    counts = crawl_incremental(base_url, pages=2)
 
-    if extracted_data:
-        save_results(extracted_data)
-        print("\n🎉 数据提取完成，已保存为 results2.json")
+    if counts['new'] or counts['changed']:
+        print(f"\n🎉 数据提取完成，已追加到 results2.jsonl: {counts}")
     else:
-        print("❌ 未找到有效内容")
+        print(f"❌ 没有新内容: {counts}")
@@ -0,0 +1,105 @@
+import threading
+
+from model_loading import load_model
+
+# Llama 3.2 3B shares the Llama 3.1 tokenizer, so the 3B fine-tune can draft for the 8B one
+DEFAULT_DRAFT_MODEL = "./llama-3.2-3b-instruct-finetuned"
+
+
+class DraftModel:
+    """A small model that drafts tokens for a larger one to verify (assisted generation).
+
+    Greedy outputs are exactly those of the large model alone; sampled outputs
+    follow the same distribution. Each verification forward of the large model
+    accepts some of the drafted tokens and adds one of its own, so
+
+        accepted = generated tokens - verification forwards
+
+    and the acceptance rate is accepted / drafted tokens. drafted_tokens counts
+    the draft model's forwards, each of which proposes one token. Counts
+    accumulate over every generate() call until reset(). The draft must be a
+    different module from the large model, or its forwards could not be told apart.
+
+    Models with a different tokenizer (e.g. the DeepSeek distill) need the
+    draft's tokenizer; generation then re-tokenizes the drafts, which costs
+    part of the speed-up, and drafted tokens are counted in the draft's vocabulary.
+    """
+
+    def __init__(self, model, tokenizer=None, num_assistant_tokens=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.num_assistant_tokens = num_assistant_tokens
+        self.lock = threading.Lock()
+        self.vocabulary_checked = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.generated = 0
+            self.drafted = 0
+            self.target_forwards = 0
+
+    def _same_vocabulary(self, tokenizer):
+        # Comparing 128k-entry vocabularies takes a while; do it once per tokenizer
+        if id(tokenizer) not in self.vocabulary_checked:
+            same = tokenizer is self.tokenizer or tokenizer.get_vocab() == self.tokenizer.get_vocab()
+            self.vocabulary_checked[id(tokenizer)] = same
+        return self.vocabulary_checked[id(tokenizer)]
+
+    def generate_kwargs(self, tokenizer):
+        """Extra generate() arguments for the large model's call"""
+        kwargs = {"assistant_model": self.model}
+        if self.tokenizer is not None and not self._same_vocabulary(tokenizer):
+            kwargs.update(tokenizer=tokenizer, assistant_tokenizer=self.tokenizer)
+        if self.num_assistant_tokens is not None:
+            kwargs["num_assistant_tokens"] = self.num_assistant_tokens
+        return kwargs
+
+    def generate(self, model, tokenizer, **kwargs):
+        """model.generate(**kwargs) with this model drafting; counts the forwards of both models"""
+        if model is self.model:
+            raise ValueError("The draft model must be a different model from the one it drafts for.")
+        counts = {"target": 0, "draft": 0}
+        thread = threading.get_ident()  # Other threads may be generating with the same models
+
+        def counter(key):
+            def hook(*args):
+                if threading.get_ident() == thread:
+                    counts[key] += 1
+            return hook
+
+        hooks = [model.register_forward_hook(counter("target")), self.model.register_forward_hook(counter("draft"))]
+        try:
+            outputs = model.generate(**kwargs, **self.generate_kwargs(tokenizer))
+        finally:
+            for hook in hooks:
+                hook.remove()
+
+        prompt_length = kwargs["input_ids"].shape[1]
+        with self.lock:
+            self.calls += 1
+            self.generated += outputs.shape[1] - prompt_length
+            self.drafted += counts["draft"]
+            self.target_forwards += counts["target"]
+        return outputs
+
+    def stats(self):
+        with self.lock:
+            accepted = max(self.generated - self.target_forwards, 0)
+            return {
+                "calls": self.calls,
+                "generated_tokens": self.generated,
+                "drafted_tokens": self.drafted,
+                "accepted_tokens": accepted,
+                "acceptance_rate": round(accepted / self.drafted, 4) if self.drafted else None,
+                # Without a draft every generated token costs one forward of the large model
+                "tokens_per_target_forward": round(self.generated / self.target_forwards, 3)
+                if self.target_forwards else None,
+            }
+
+
+def load_draft_model(model_path, tokenizer_path=None, num_assistant_tokens=None, **load_kwargs):
+    """Load a draft model; its tokenizer is kept so mismatched vocabularies can be translated"""
+    model, tokenizer = load_model(model_path, tokenizer_path, **load_kwargs)
+    return DraftModel(model, tokenizer, num_assistant_tokens)
@@ -1,25 +1,84 @@
-import json
-from sklearn.model_selection import train_test_split
+import argparse
+import hashlib
+import re
 
-# Load the dataset
-with open('modified.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+from dataset_io import RecordWriter, read_records
 
-# Ensure the data format is correct
-if isinstance(data, list) and all('text' in sample for sample in data):
-    print(f"Dataset loaded successfully, with {len(data)} samples.")
-else:
-    raise ValueError("Incorrect data format, each sample should be a dictionary containing 'text'.")
+# Claims are quoted inside the instruction of every sample
+claim_pattern = re.compile(r'Please evaluate the following claim "(.*?)"\.', re.S)
 
-# Split the dataset (80% training, 20% testing)
-train_data, test_data = train_test_split(data, test_size=0.2, random_state=42)
 
-# Save the split datasets
-with open('train_dataset.json', 'w', encoding='utf-8') as train_file:
-    json.dump(train_data, train_file, ensure_ascii=False, indent=4)
+def stable_hash(value, seed=0):
+    """Float in [0, 1) from a key, the same on every run and machine"""
+    digest = hashlib.blake2b(f"{seed}:{value}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
 
-with open('test_dataset.json', 'w', encoding='utf-8') as test_file:
-    json.dump(test_data, test_file, ensure_ascii=False, indent=4)
 
-print(f"Training set saved to train_dataset.json, with {len(train_data)} samples.")
-print(f"Testing set saved to test_dataset.json, with {len(test_data)} samples.")
+def record_key(record, key):
+    """The value a record is split on. "claim" falls back to the claim quoted in `text`, then to `text` itself"""
+    if key == "claim" and "claim" not in record:
+        match = claim_pattern.search(record["text"])
+        return match.group(1) if match else record["text"]
+    if key not in record:
+        raise ValueError(f"Incorrect data format, sample has no {key!r} field to split on.")
+    return record[key]
+
+
+def assign_split(key_value, test_size=0.2, validation_size=0.0, folds=0, seed=42):
+    """Split name for a key: "fold<i>" with folds, else "test", "validation" or "train".
+
+    The assignment depends only on the key and the seed, so a sample keeps its
+    split when more data is added.
+    """
+    position = stable_hash(key_value, seed)
+    if folds:
+        return f"fold{int(position * folds)}"
+    if position < test_size:
+        return "test"
+    if position < test_size + validation_size:
+        return "validation"
+    return "train"
+
+
+def split_dataset(input_path, outputs, key="claim", test_size=0.2, validation_size=0.0, folds=0, seed=42):
+    """Stream `input_path` once, writing each record to outputs[split name]; returns the counts per split"""
+    writers = {name: RecordWriter(path) for name, path in outputs.items()}
+    try:
+        for record in read_records(input_path):
+            # Ensure the data format is correct
+            if not isinstance(record, dict) or "text" not in record:
+                raise ValueError("Incorrect data format, each sample should be a dictionary containing 'text'.")
+            writers[assign_split(record_key(record, key), test_size, validation_size, folds, seed)].write(record)
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    return {name: writer.close() for name, writer in writers.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split a dataset by a stable hash of each sample's key.")
+    parser.add_argument("--input", default="modified.json")
+    parser.add_argument("--key", default="claim",
+                        help="Field to split on, e.g. url, cluster (from dedup.py) or claim (default)")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--validation-size", type=float, default=0.0)
+    parser.add_argument("--folds", type=int, default=0, help="Write K folds instead of train/test")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--train", default="train_dataset.json")
+    parser.add_argument("--test", default="test_dataset.json")
+    parser.add_argument("--validation", default="validation_dataset.json")
+    parser.add_argument("--fold-output", default="fold{}_dataset.jsonl", help="Fold file name pattern")
+    args = parser.parse_args()
+
+    if args.folds:
+        outputs = {f"fold{i}": args.fold_output.format(i) for i in range(args.folds)}
+    else:
+        outputs = {"train": args.train, "test": args.test}
+        if args.validation_size:
+            outputs["validation"] = args.validation
+    counts = split_dataset(args.input, outputs, args.key, args.test_size, args.validation_size, args.folds, args.seed)
+
+    # Save the split datasets
+    for name, path in outputs.items():
+        print(f"{name.capitalize()} set saved to {path}, with {counts[name]} samples.")
@@ -0,0 +1,65 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from generation import generate_responses
+
+WORDS = ["<unk>", "<s>", "</s>", "[INST]Please", "evaluate", "the", "following", "claim", "sky", "is", "green"]
+
+
+@pytest.fixture
+def tiny_model(tmp_path):
+    """A 2-layer random Llama with a word-level tokenizer, saved so it has a path like a real checkpoint"""
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    backend = Tokenizer(models.WordLevel({word: i for i, word in enumerate(WORDS)}, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="<unk>", bos_token="<s>", eos_token="</s>"
+    )
+    config = transformers.LlamaConfig(
+        vocab_size=len(WORDS), hidden_size=16, intermediate_size=32, num_hidden_layers=2,
+        num_attention_heads=2, num_key_value_heads=2, bos_token_id=1, eos_token_id=2
+    )
+    torch.manual_seed(0)
+    path = str(tmp_path / "tiny")
+    transformers.LlamaForCausalLM(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    model = transformers.AutoModelForCausalLM.from_pretrained(path)
+    model.eval()
+    return model, transformers.AutoTokenizer.from_pretrained(path)
+
+
+def count_generate_calls(model):
+    calls = {"n": 0}
+    generate = model.generate
+
+    def counting_generate(*args, **kwargs):
+        calls["n"] += 1
+        return generate(*args, **kwargs)
+
+    model.generate = counting_generate
+    return calls
+
+
+def test_checkpoint_resumes_and_refresh_regenerates(tiny_model, tmp_path):
+    model, tokenizer = tiny_model
+    samples = [{"text": "[INST]Please evaluate the following claim sky is green " * (i + 1)} for i in range(6)]
+    runs_dir = str(tmp_path / "runs")
+    calls = count_generate_calls(model)
+
+    first = generate_responses(model, tokenizer, samples, max_new_tokens=4, checkpoint_dir=runs_dir, checkpoint_every=2)
+    assert calls["n"] == 6
+
+    # Everything is on disk: a rerun generates nothing
+    assert generate_responses(model, tokenizer, samples, max_new_tokens=4, checkpoint_dir=runs_dir) == first
+    assert calls["n"] == 6
+
+    # refresh=True regenerates every sample and rewrites the checkpoint
+    refreshed = generate_responses(model, tokenizer, samples, max_new_tokens=4, refresh=True,
+                                   checkpoint_dir=runs_dir, checkpoint_every=2)
+    assert calls["n"] == 12
+    assert refreshed == first
+    assert generate_responses(model, tokenizer, samples, max_new_tokens=4, checkpoint_dir=runs_dir) == first
+    assert calls["n"] == 12
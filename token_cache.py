@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import torch
+
+from dataset_io import read_records
+
+DEFAULT_CACHE_DIR = "./token_cache"
+_TOKENIZE_CHUNK = 1000  # Texts tokenized per call while building a store
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash of everything that decides the token ids: vocabulary, merges, normalizer and special tokens"""
+    digest = hashlib.sha256(type(tokenizer).__name__.encode("utf-8"))
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        digest.update(backend.to_str().encode("utf-8"))
+    else:
+        digest.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode("utf-8"))
+    digest.update(json.dumps(tokenizer.special_tokens_map, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TokenStore:
+    """Token ids of a whole dataset in one flat memory-mapped int32 array.
+
+    Row i is ids[offsets[i]:offsets[i + 1]]; rows are exposed as tensor views of
+    the mapped file, and batches are assembled with NumPy, without Python lists.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+        self.lengths = np.diff(self.offsets)
+        total = int(self.offsets[-1])
+        # Copy-on-write mapping: writable for torch.from_numpy, never written back to disk
+        self.ids = (np.memmap(os.path.join(directory, "ids.bin"), dtype=np.int32, mode="c", shape=(total,))
+                    if total else np.zeros(0, dtype=np.int32))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def row(self, i):
+        """Token ids of sample i as a zero-copy tensor view of the mapped file"""
+        return torch.from_numpy(self.ids[self.offsets[i]:self.offsets[i + 1]])
+
+    def batch(self, indices, pad_token_id, pad_to=None, mask_padding_labels=False):
+        """input_ids / attention_mask / labels for the given samples, right-padded to pad_to or the longest one.
+
+        Always on the right: with left padding the first real token of a shorter
+        row would get a label predicted from a masked pad position.
+        """
+        indices = np.asarray(indices)
+        lengths = self.lengths[indices]
+        width = pad_to or int(lengths.max())
+        input_ids = np.full((len(indices), width), pad_token_id, dtype=np.int64)
+        for row, (i, length) in enumerate(zip(indices, lengths)):
+            start = self.offsets[i]
+            input_ids[row, :length] = self.ids[start:start + length]
+
+        attention_mask = np.arange(width)[None, :] < lengths[:, None]
+
+        input_ids = torch.from_numpy(input_ids)
+        attention_mask = torch.from_numpy(attention_mask.astype(np.int64))
+        labels = input_ids.clone()
+        if mask_padding_labels:
+            labels[attention_mask == 0] = -100  # Ignored by the loss
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels}
+
+    def iter_batches(self, batch_size, pad_token_id, pad_to=None):
+        """Fixed-size batches in dataset order"""
+        for start in range(0, len(self), batch_size):
+            yield self.batch(range(start, min(start + batch_size, len(self))), pad_token_id, pad_to)
+
+    def token_budget_batches(self, max_tokens):
+        """Group samples, longest first, so each batch padded to its longest row holds at most max_tokens tokens.
+
+        A sample longer than max_tokens on its own still gets a batch of one.
+        """
+        order = np.argsort(-self.lengths, kind="stable")
+        batches = []
+        current = []
+        for i in order:
+            # Sorted longest first, so the first row of a batch sets its padded width
+            width = self.lengths[current[0]] if current else self.lengths[i]
+            if current and (len(current) + 1) * width > max_tokens:
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+
+    def iter_dynamic_batches(self, max_tokens, pad_token_id):
+        """Length-sorted token-budget batches padded to their longest row, with pad positions left out of the labels"""
+        for indices in self.token_budget_batches(max_tokens):
+            yield self.batch(indices, pad_token_id, mask_padding_labels=True)
+
+
+def _build(directory, dataset_path, tokenizer, max_length):
+    tmp_directory = directory + ".tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    offsets = [0]
+
+    def tokenize(texts, f):
+        encoded = tokenizer(texts, truncation=True, max_length=max_length)["input_ids"]
+        for ids in encoded:
+            np.asarray(ids, dtype=np.int32).tofile(f)
+            offsets.append(offsets[-1] + len(ids))
+
+    with open(os.path.join(tmp_directory, "ids.bin"), "wb") as f:
+        texts = []
+        for record in read_records(dataset_path):
+            texts.append(record["text"])
+            if len(texts) == _TOKENIZE_CHUNK:
+                tokenize(texts, f)
+                texts = []
+        if texts:
+            tokenize(texts, f)
+
+    np.save(os.path.join(tmp_directory, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(tmp_directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"dataset": dataset_path, "max_length": max_length, "samples": len(offsets) - 1,
+                   "tokenizer": tokenizer.name_or_path}, f, indent=4)
+    # Publish the finished store in one step, so a crash never leaves a half-written cache behind
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+
+
+def load_token_store(dataset_path, tokenizer, max_length=512, cache_dir=DEFAULT_CACHE_DIR):
+    """Open the token store for (dataset contents, tokenizer, max_length), tokenizing only on the first call"""
+    key = hashlib.sha256(
+        f"{file_fingerprint(dataset_path)}:{tokenizer_fingerprint(tokenizer)}:{max_length}".encode("utf-8")
+    ).hexdigest()[:24]
+    directory = os.path.join(cache_dir, key)
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        print(f"Tokenizing {dataset_path} into {directory}...")
+        os.makedirs(cache_dir, exist_ok=True)
+        _build(directory, dataset_path, tokenizer, max_length)
+    return TokenStore(directory)
@@ -1,32 +1,149 @@
-import json
+import argparse
 import csv
+import json
+import os
+import time
 
-# 假设JSON数据存储在json文件中，名为"data.json"
+# 训练日志（每行一个 JSON 的 trainer 日志，或 trainer_state.json），以及输出的 CSV
 input_file = "test_loss.json"
 output_file = "test_loss.csv"
+follow_interval = 2.0  # follow 模式下检查日志增长的间隔（秒）
+
+# loss 和 epoch 固定放在最前面，其余数值字段按第一次出现的顺序追加成新列
+LEADING_COLUMNS = ["loss", "epoch"]
+OFFSET_SUFFIX = ".offset"
+
+
+def numeric_fields(entry):
+    """提取一条日志里的所有数值字段；train_loss 统一命名为 loss"""
+    row = {}
+    for key, value in entry.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            row["loss" if key == "train_loss" and "loss" not in entry else key] = value
+    return row
+
+
+class CsvTable:
+    """只追加的 CSV；出现新列时重写表头（只重写输出文件，不重新解析日志）"""
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        self.columns = list(columns or LEADING_COLUMNS)
+
+    def reset(self):
+        with open(self.path, "w", newline="") as csvfile:
+            csv.writer(csvfile).writerow(self.columns)
+
+    def _add_columns(self, new_columns):
+        with open(self.path, "r", newline="") as csvfile:
+            rows = list(csv.DictReader(csvfile))
+        self.columns.extend(new_columns)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=self.columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, self.path)
+
+    def append(self, rows):
+        if not rows:
+            return
+        new_columns = []
+        for row in rows:
+            new_columns.extend(key for key in row if key not in self.columns and key not in new_columns)
+        if new_columns:
+            self._add_columns(new_columns)
+        with open(self.path, "a", newline="") as csvfile:
+            csv.DictWriter(csvfile, fieldnames=self.columns).writerows(rows)
+
+
+def _load_offset(output_path):
+    path = output_path + OFFSET_SUFFIX
+    if not os.path.exists(path) or not os.path.exists(output_path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_offset(output_path, offset, columns):
+    tmp_path = output_path + OFFSET_SUFFIX + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"offset": offset, "columns": columns}, f)
+    os.replace(tmp_path, output_path + OFFSET_SUFFIX)
+
+
+def read_new_lines(path, offset, partial=False):
+    """从字节偏移 offset 开始读出完整的行；返回 (记录列表, 新的偏移)。
+    partial=False 时没有换行符的最后一行可能还没写完，留到下次再读"""
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n") and not partial:
+                break
+            offset += len(line)
+            if line.strip():
+                records.append(json.loads(line))
+    return records, offset
+
+
+def convert_trainer_state(path, table):
+    """trainer_state.json 是一个完整的 JSON 对象，日志在 log_history 里"""
+    with open(path, "r", encoding="utf-8") as f:
+        history = json.load(f).get("log_history", [])
+    table.append([row for row in map(numeric_fields, history) if row])
+    return len(history)
+
+
+def convert(input_path, output_path, follow=False, interval=follow_interval):
+    """把训练日志转成 CSV；follow 模式从上次保存的偏移继续读取，并持续跟踪不断增长的日志"""
+    if os.path.basename(input_path) == "trainer_state.json":
+        table = CsvTable(output_path)
+        table.reset()
+        count = convert_trainer_state(input_path, table)
+        print(f"{count} log entries from {input_path}")
+        return
+
+    state = _load_offset(output_path) if follow else None
+    if state is not None and state["offset"] <= os.path.getsize(input_path):
+        offset = state["offset"]
+        table = CsvTable(output_path, state["columns"])
+    else:
+        # 从头转换（或日志被截断/重新开始了）
+        offset = 0
+        table = CsvTable(output_path)
+        table.reset()
+
+    total = 0
+    while True:
+        if os.path.getsize(input_path) < offset:
+            print(f"{input_path} was truncated; starting over")
+            offset = 0
+            table = CsvTable(output_path)
+            table.reset()
+        records, offset = read_new_lines(input_path, offset, partial=not follow)
+        table.append([row for row in map(numeric_fields, records) if row])
+        total += len(records)
+        if follow:
+            _save_offset(output_path, offset, table.columns)
+        if records:
+            print(f"{total} log entries written to {output_path}")
+        if not follow:
+            break
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert trainer logs to a CSV with one column per numeric field.")
+    parser.add_argument("input", nargs="?", default=input_file, help="JSON lines log or trainer_state.json")
+    parser.add_argument("output", nargs="?", default=output_file)
+    parser.add_argument("--follow", action="store_true",
+                        help="Keep tailing the log, resuming from the offset saved next to the output")
+    parser.add_argument("--interval", type=float, default=follow_interval)
+    args = parser.parse_args()
 
-# 打开并读取JSON文件
-with open(input_file, "r") as f:
-    data = [json.loads(line) for line in f]
-
-# 提取"loss"（包含train_loss处理）和"epoch"字段
-filtered_data = []
-for entry in data:
-    # 处理train_loss字段，统一命名为loss
-    loss = entry.get("train_loss", entry.get("loss"))
-    epoch = entry.get("epoch")
-    if loss is not None and epoch is not None:
-        filtered_data.append({"loss": loss, "epoch": epoch})
-
-# 将提取的数据写入CSV文件
-with open(output_file, "w", newline="") as csvfile:
-    fieldnames = ["loss", "epoch"]
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    
-    # 写入表头
-    writer.writeheader()
-    
-    # 写入数据
-    writer.writerows(filtered_data)
-
-print(f"CSV file saved as {output_file}")
+    try:
+        convert(args.input, args.output, follow=args.follow, interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+    print(f"CSV file saved as {args.output}")